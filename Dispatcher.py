@@ -0,0 +1,217 @@
+import queue
+import time as timer
+from datetime import timedelta
+
+from Planner import Action, HubPlanner, reachable
+from Stop import build_stops, resolved_address
+from Truck import Truck
+
+# Minutes a truck waits at the hub for more packages before leaving with what it has.
+default_hold_minutes = 30
+# Minutes kept free on top of the direct drive when a deadline forces a truck to leave.
+dispatch_buffer_minutes = 20
+# Target for the time it takes to take in one arrival, including the trips it commits.
+default_latency_target_ms = 50
+# Largest number of pending packages considered for one trip. The packages with the earliest deadlines are considered
+# first. This keeps the work of a commit bounded however large the pending pool grows.
+candidate_limit = 3 * Truck.capacity
+# Seconds a queue feed waits for the next arrival before it lets the trucks that are due leave.
+default_poll_seconds = 1.0
+
+
+class StreamingDispatcher:
+
+    # The streaming dispatcher plans one trip at a time while packages keep arriving at the hub during the day, instead
+    # of planning the whole day up front. Arriving packages wait in a pending pool. A truck at the hub leaves once it
+    # has waited hold_minutes for more packages, once the pool can fill it, or earlier when a pending deadline forces
+    # it to go. Each trip is committed with the same trip builder and route solver the day planner uses, and drives
+    # with the times of the travel time table.
+    def __init__(self, location_graph, start_time, hub=None, hold_minutes=default_hold_minutes,
+                 latency_target_ms=default_latency_target_ms, travel_times=None):
+        self.location_graph = location_graph
+        self.hub = hub if hub is not None else next(iter(location_graph.hubs))
+        self.hold = timedelta(minutes=hold_minutes)
+        self.latency_target_ms = latency_target_ms
+
+        self.planner = HubPlanner(location_graph, self.hub, location_graph.hubs[self.hub], travel_times=travel_times)
+        self.travel_times = self.planner.travel_times
+        # The exact solver may use half of the latency target, after which the insertion order is kept.
+        self.planner.route_solver.time_cap_seconds = latency_target_ms / 2000
+
+        self.trucks = [Truck(truck_number, self.hub) for truck_number in location_graph.hubs[self.hub]]
+        for truck in self.trucks:
+            truck.time = start_time
+            truck.loading_time = start_time
+
+        self.pending = []
+        self.unreachable = []
+        self.arrival_times = {}
+        self.actions = []
+        self.trips = []
+        self.latencies_ms = []
+
+    # Time: O(L) Space: O(1)
+    # Returns the latest time the package can leave the hub on a direct drive and still make its deadline, or None if
+    # it has no deadline. The drive is timed at the slowest speed of the day, since the departure is not known yet.
+    def latest_departure(self, package):
+        deadline = package.constraints["Deadline"]
+        if deadline is None:
+            return None
+        location_name = self.location_graph.location_name_from_address(resolved_address(package))
+        direct_miles = self.location_graph.miles_between(self.hub, location_name) or 0.0
+        return deadline - timedelta(hours=direct_miles / self.travel_times.slowest_mph, minutes=dispatch_buffer_minutes)
+
+    # Time: O(N log N) Space: O(N)
+    # Returns when the truck should leave with the pending packages. final is set once no more packages will arrive.
+    # The truck leaves as soon as enough packages have arrived to fill it.
+    def departure_time(self, truck, final):
+        arrivals = sorted(self.arrival_times[package.package_id] for package in self.pending)
+        available = max(truck.time, arrivals[0])
+        if final:
+            return available
+
+        departure = available + self.hold
+        if len(arrivals) >= truck.capacity:
+            departure = min(departure, max(available, arrivals[truck.capacity - 1]))
+        for package in self.pending:
+            latest_departure = self.latest_departure(package)
+            if latest_departure is not None and latest_departure < departure:
+                departure = latest_departure
+        return max(available, departure)
+
+    # Time: O(N^2) Space: O(N)
+    # Loads a trip onto the truck from the pending pool and creates its actions. Only packages that have arrived by the
+    # departure are loaded. Returns the trip as a (truck number, departure, package IDs) tuple, or None if nothing in
+    # the pool can go on this truck.
+    def commit(self, truck, departure):
+        truck.time = departure
+        truck.loading_time = departure
+        truck.last_location = self.hub
+
+        arrived = [package for package in self.pending if self.arrival_times[package.package_id] <= departure]
+        candidates = sorted(arrived, key=lambda package: (package.constraints["Deadline"] is None,
+                                                               package.constraints["Deadline"] or departure,
+                                                               package.package_id))[:candidate_limit]
+        stops = build_stops(candidates, self.location_graph)
+
+        # A stop that can no longer make its deadline is delivered as soon as possible without a deadline, since the
+        # trip builder would otherwise never place it.
+        for stop in stops:
+            deadline = stop.constraints["Deadline"]
+            if deadline is not None:
+                if self.travel_times.arrival_time(self.hub, stop.location_name, departure) > deadline:
+                    stop.constraints["Deadline"] = None
+
+        stop_tiers = [[stop for stop in stops if stop.constraints["Deadline"]],
+                      [stop for stop in stops if not stop.constraints["Deadline"]]]
+        trip_stops = self.planner.trip_builder.build(truck, stop_tiers)
+        if not trip_stops:
+            truck.unload_all()
+            return None
+
+        trip_stops = self.planner.trip_order(truck, trip_stops)
+
+        package_ids = [package.package_id for stop in trip_stops for package in stop.packages]
+        for package_id in package_ids:
+            self.actions.append(Action("LoadTruck", truck.loading_time, (truck.number, package_id)))
+        self.actions += self.planner.prep_trip_actions(truck, trip_stops)
+        truck.trips += 1
+        truck.reloading()
+
+        loaded_ids = set(package_ids)
+        self.pending = [package for package in self.pending if package.package_id not in loaded_ids]
+        trip = (truck.number, departure, package_ids)
+        self.trips.append(trip)
+        return trip
+
+    # Time: O(T * N^2) Space: O(N)
+    # Commits every trip that has to leave before the given time, or every remaining trip when until is None. Returns
+    # the trips committed.
+    def advance(self, until=None):
+        committed_trips = []
+        while self.pending:
+            trip = None
+            for truck in sorted(self.trucks, key=lambda hub_truck: (hub_truck.time, hub_truck.trips)):
+                departure = self.departure_time(truck, until is None)
+                if until is not None and departure >= until:
+                    continue
+                trip = self.commit(truck, departure)
+                if trip is not None:
+                    break
+            if trip is None:
+                break
+            committed_trips.append(trip)
+        return committed_trips
+
+    # Time: O(T * N^2) Space: O(N)
+    # Takes in a package that arrived at the hub at the arrival time. Arrivals must come in time order. Trips that had
+    # to leave before the arrival are committed first and returned. A package the hub cannot reach is set aside as
+    # undelivered. The time taken is recorded against the latency target.
+    def receive(self, arrival_time, package):
+        started = timer.perf_counter()
+        committed_trips = self.advance(arrival_time)
+        location_name = self.location_graph.location_name_from_address(resolved_address(package))
+        if reachable(self.location_graph, self.hub, [location_name]):
+            self.pending.append(package)
+        else:
+            self.unreachable.append(package)
+        self.arrival_times[package.package_id] = arrival_time
+        self.latencies_ms.append((timer.perf_counter() - started) * 1000)
+        return committed_trips
+
+    # Time: O(T * N^2) Space: O(N)
+    # Commits the remaining trips once no more packages will arrive. Packages no truck of the hub can take stay in the
+    # pending pool and are reported by undelivered_package_ids.
+    def finish(self):
+        return self.advance()
+
+    # Time: O(N log N) Space: O(N)
+    # Returns the IDs of the packages left in the pending pool and the packages the hub cannot reach, which are never
+    # delivered.
+    def undelivered_package_ids(self):
+        return sorted(package.package_id for package in self.pending + self.unreachable)
+
+    # Time: O(A * T * N^2) Space: O(N)
+    # Dispatches every arrival of the feed, which yields (arrival time, package) pairs, and returns the actions of all
+    # trips sorted by time.
+    def run(self, feed):
+        for arrival_time, package in feed:
+            self.receive(arrival_time, package)
+        self.finish()
+        return sorted(self.actions, key=lambda action: action.time)
+
+    # Time: O(N) Space: O(N)
+    # Returns the IDs of the packages delivered after their deadline by the committed trips.
+    def late_package_ids(self, package_manager):
+        late_ids = []
+        for action in self.actions:
+            if action.action_type == "DeliveredPackage":
+                deadline = package_manager.packages.get_package(action.value[2]).constraints["Deadline"]
+                if deadline is not None and action.time > deadline:
+                    late_ids.append(action.value[2])
+        return sorted(late_ids)
+
+
+# Time: O(N log N) Space: O(N)
+# Returns a feed that replays the package file as if the packages arrived during the day. Packages delayed on a flight
+# arrive when the flight lands and packages with a wrong address arrive once the address is corrected. Every other
+# package is at the hub at the start time.
+def simulated_feed(packages, start_time):
+    arrivals = [(package.constraints.get("Delayed", start_time), package) for package in packages]
+    arrivals.sort(key=lambda arrival: (arrival[0], arrival[1].package_id))
+    return iter(arrivals)
+
+
+# Returns a feed that takes (arrival time, package) pairs from the queue until None is put on it. When nothing arrives
+# for poll_seconds the dispatcher is advanced to the current time given by clock, so trucks that are due leave even
+# while the feed is quiet.
+def queue_feed(package_queue, dispatcher, clock, poll_seconds=default_poll_seconds):
+    while True:
+        try:
+            arrival = package_queue.get(timeout=poll_seconds)
+        except queue.Empty:
+            dispatcher.advance(clock())
+            continue
+        if arrival is None:
+            return
+        yield arrival
@@ -0,0 +1,101 @@
+import json
+from datetime import datetime
+
+from Scheduler import Action, apply_action, undo_action
+
+
+# Time: O(1) Space: O(1)
+# Returns the package ID the action is about or None for actions that are not about a single package.
+def action_package_id(action):
+    if action.action_type in ("LoadTruck", "DelayStatus", "DeliverPackage", "FixedAddress"):
+        return action.value[1]
+    if action.action_type == "DeliveredPackage":
+        return action.value[2]
+    return None
+
+
+# Time: O(1) Space: O(1)
+# Returns the miles driven by the action or None for actions that do not move the truck.
+def action_miles(action):
+    if action.action_type in ("DeliveredPackage", "Returning"):
+        return action.value[1]
+    return None
+
+
+class EventLogWriter:
+
+    # The event log writer appends one JSON line for every action the scheduler applies or undoes. Each line is flushed
+    # as soon as it is written so other programs can follow the log while the application is running. A new log starts
+    # with a Plan header event holding the digest of the plan the actions come from.
+    def __init__(self, file_name, plan_digest=None):
+        self.file_name = file_name
+        self.log_file = open(file_name, "a", encoding="UTF-8")
+        if plan_digest is not None and self.log_file.tell() == 0:
+            self.log_file.write(json.dumps({"type": "Plan", "plan": plan_digest}) + "\n")
+            self.log_file.flush()
+
+    # Time: O(1) Space: O(1)
+    # Writes the action as an event. clock is the application time the action was applied at and undo marks actions
+    # that were reversed because the time was moved backwards.
+    def write_action(self, action, clock, undo=False):
+        event = {"type": action.action_type,
+                 "time": action.time.isoformat(),
+                 "truck": action.value[0],
+                 "package": action_package_id(action),
+                 "miles": action_miles(action),
+                 "undo": undo,
+                 "clock": clock.isoformat(),
+                 "value": action.value}
+        self.log_file.write(json.dumps(event) + "\n")
+        self.log_file.flush()
+
+    def close(self):
+        self.log_file.close()
+
+
+class EventLogReader:
+
+    def __init__(self, file_name):
+        self.file_name = file_name
+
+    # Time: O(N) Space: O(1)
+    # Yields every event of the log in the order it was written. A partially written last line, which happens if the
+    # application stopped while writing it, is skipped.
+    def events(self):
+        with open(self.file_name, "r", encoding="UTF-8") as log_file:
+            for line in log_file:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+    # Time: O(1) Space: O(1)
+    # Returns the plan digest of the Plan header event, or None if the log has no header.
+    def plan_digest(self):
+        for event in self.events():
+            if event.get("type") == "Plan":
+                return event["plan"]
+            return None
+        return None
+
+    # Time: O(N) Space: O(N)
+    # Rebuilds the package and truck state by applying every event of the log in a single pass. trucks maps each truck
+    # number to its truck. Returns the actions still applied at the end of the log, oldest first, along with the
+    # application time of the last event. The scheduler uses them to resume where the log stopped. The log must have
+    # been written for the same plan, which is checked with plan_digest before replaying.
+    def replay(self, package_manager, trucks):
+        applied_actions = []
+        clock = None
+        for event in self.events():
+            if event["type"] == "Plan":
+                continue
+            action = Action(event["type"], datetime.fromisoformat(event["time"]), tuple(event["value"]))
+            if event["undo"]:
+                undo_action(action, package_manager, trucks)
+                applied_actions.pop()
+            else:
+                apply_action(action, package_manager, trucks)
+                applied_actions.append(action)
+            clock = datetime.fromisoformat(event["clock"])
+
+        return applied_actions, clock
@@ -1,3 +1,22 @@
+import csv
+import heapq
+from array import array
+from collections import OrderedDict
+
+distance_table_file_name = 'WGUPS Distance Table.csv'
+# Distances are stored as 32 bit floats. Lookups are rounded to this many decimal places so the values match the
+# precision of the distance table instead of showing float32 noise.
+distance_precision = 4
+# Graphs up to this many locations get every shortest path computed up front with Floyd-Warshall. Larger road networks
+# compute shortest paths on demand with Dijkstra's algorithm instead.
+floyd_warshall_limit = 200
+# Number of Dijkstra results kept for reuse on large road networks.
+dijkstra_cache_size = 256
+# Hub and truck numbers used when the location data does not list its own hubs.
+default_hub_location = "Western Governors University"
+default_fleet = (1, 2)
+
+
 class Location:
 
     def __init__(self, name, address):
@@ -7,15 +26,70 @@ class Location:
 
 class LocationGraph:
 
-    #  Time: O(N)    Space: O(N)
+    #  Time: O(N^3)    Space: O(N^2)
     # Location information is imported from the WGUPS Distance Table.csv file and converted into location objects. The
-    # distance information is also imported in this function and is stored in a dictionary data structure.
-    def __init__(self):
-        location_file = open('WGUPS Distance Table.csv', 'r', encoding='UTF-8', newline='\r\n')
+    # distance table is symmetric so only the lower triangle is kept. It is packed row by row into a single float32
+    # array, which takes 4 bytes per pair instead of a Python float inside nested dictionaries.
+    # A sparse road network can be loaded instead by setting road_network. Either way the direct distances are replaced
+    # by shortest path distances so routes can pass through other locations when that is shorter.
+    # hubs maps the location of every depot to the numbers of the trucks based there.
+    def __init__(self, file_name=distance_table_file_name, road_network=False):
+        self.file_name = file_name
+        self.locations = []
+        self.location_index = {}
+        self.hubs = {}
+        self.distances = None
+        self.predecessors = None
+        self.adjacency = None
+        self.dijkstra_cache = OrderedDict()
+
+        if road_network:
+            self.load_road_network(file_name)
+        else:
+            self.load_distance_table(file_name)
+
+        if not self.hubs and self.locations:
+            if default_hub_location in self.location_index:
+                self.add_hub(default_hub_location, default_fleet)
+            else:
+                self.add_hub(self.locations[0].name, default_fleet)
+
+    def add_location(self, name, address):
+        location_node = Location(name, address)
+        self.location_index[location_node.name] = len(self.locations)
+        self.locations.append(location_node)
+
+    # Makes the location a hub with its own fleet of trucks.
+    def add_hub(self, location_name, truck_numbers):
+        self.hubs[location_name] = list(truck_numbers)
+
+    # Time: O(H)    Space: O(1)
+    # Returns the hub the truck is based at or None for an unknown truck.
+    def hub_of_truck(self, truck_number):
+        for hub, truck_numbers in self.hubs.items():
+            if truck_number in truck_numbers:
+                return hub
+        return None
+
+    # Time: O(H)    Space: O(1)
+    # Returns the hub with the fewest miles to the location or None if no hub can reach it.
+    def nearest_hub(self, location_name):
+        nearest = None
+        nearest_miles = None
+        for hub in self.hubs.keys():
+            miles = self.miles_between(hub, location_name)
+            if miles is not None and (nearest_miles is None or miles < nearest_miles):
+                nearest = hub
+                nearest_miles = miles
+        return nearest
+
+    #  Time: O(N^3)    Space: O(N^2)
+    # Reads the complete distance table into the packed triangle and closes it over shortest paths.
+    def load_distance_table(self, file_name):
+        location_file = open(file_name, 'r', encoding='UTF-8', newline='\r\n')
 
         location_name_addresses = location_file.readline().partition(',,"')[2].split('","')
 
-        self.locations = []
         # Time: O(N)    Space: O(N)
         for location in location_name_addresses:
             part_location = location.split("\n")
@@ -25,27 +99,150 @@ class LocationGraph:
                 address += part_location[i]
                 if " Sta " in address:
                     address = address.replace(" Sta ", " Station ")
-            location_node = Location(location_name.strip(), address.replace('"', '').strip())
-            self.locations.append(location_node)
+            self.add_location(location_name.strip(), address.replace('"', '').strip())
+
+        # Missing distances are stored as NaN so they can be told apart from a distance of zero.
+        location_count = len(self.locations)
+        self.distances = array('f', [float('nan')]) * (location_count * (location_count - 1) // 2)
 
         distance_row = location_file.readline()
-        self.location_edges = {}
-        # Time: O(N)    Space: O(N)
+        # Time: O(N^2)    Space: O(N^2)
         while distance_row != "":
             part_distance_row = distance_row.partition('",')
             row_name = part_distance_row[0].replace('"', '').partition("\n")[0].strip()
-            if row_name not in self.location_edges:
-                self.location_edges[row_name] = {}
+            row_index = self.location_index[row_name]
             distance_values = part_distance_row[2].split(",")[1:]
 
             for i in range(len(distance_values)):
-                if distance_values[i] == '' or distance_values[i] == '\r\n':
+                if distance_values[i] == '' or distance_values[i] == '\r\n' or i == row_index:
                     continue
-                # edge = (row_name, locations[i].name, distance_values[i].strip('\r\n'))
-                self.location_edges[row_name][self.locations[i].name] = float(distance_values[i].strip('\r\n'))
+                self.distances[self.edge_index(row_index, i)] = float(distance_values[i].strip('\r\n'))
 
             distance_row = location_file.readline()
 
+        location_file.close()
+
+        # Very large tables are used as they are since the closure would take too long. Their paths are always direct.
+        if location_count <= floyd_warshall_limit:
+            matrix = [[0.0 if i == j else self.stored_distance(i, j) for j in range(location_count)]
+                      for i in range(location_count)]
+            self.close_shortest_paths(matrix)
+
+    #  Time: O(N^3) or O(E)    Space: O(N^2) or O(N + E)
+    # Reads a road network made of Location rows (name, address) and Edge rows (start, destination, miles). Only the
+    # roads that exist need to be listed. Hub rows (name, truck numbers separated by spaces) mark the depots. Small
+    # networks are closed over shortest paths right away, larger networks keep the roads as adjacency lists for
+    # Dijkstra's algorithm.
+    def load_road_network(self, file_name):
+        edges = []
+        with open(file_name, 'r', encoding='UTF-8', newline='') as road_file:
+            for row in csv.reader(road_file):
+                if not row:
+                    continue
+                if row[0] == "Location":
+                    self.add_location(row[1].strip(), row[2].strip())
+                elif row[0] == "Edge":
+                    edges.append((row[1].strip(), row[2].strip(), float(row[3])))
+                elif row[0] == "Hub":
+                    self.add_hub(row[1].strip(), [int(number) for number in row[2].split()])
+
+        location_count = len(self.locations)
+        if location_count <= floyd_warshall_limit:
+            infinity = float('inf')
+            matrix = [[0.0 if i == j else infinity for j in range(location_count)] for i in range(location_count)]
+            for start, destination, miles in edges:
+                start_index = self.location_index[start]
+                destination_index = self.location_index[destination]
+                if miles < matrix[start_index][destination_index]:
+                    matrix[start_index][destination_index] = miles
+                    matrix[destination_index][start_index] = miles
+            self.close_shortest_paths(matrix)
+        else:
+            self.adjacency = [[] for i in range(location_count)]
+            for start, destination, miles in edges:
+                start_index = self.location_index[start]
+                destination_index = self.location_index[destination]
+                self.adjacency[start_index].append((destination_index, miles))
+                self.adjacency[destination_index].append((start_index, miles))
+
+    #  Time: O(N^3)    Space: O(N^2)
+    # Runs Floyd-Warshall over the distance matrix, where missing roads are infinite, and stores the result in the
+    # packed triangle. Each row is updated as a whole with list comprehensions, which keeps the work in the
+    # interpreter's fast paths instead of a triple nested loop. predecessors[i * N + j] is the location visited right
+    # before j on the shortest path from i to j.
+    def close_shortest_paths(self, matrix):
+        infinity = float('inf')
+        location_count = len(matrix)
+        predecessors = [[i if matrix[i][j] != infinity else -1 for j in range(location_count)]
+                        for i in range(location_count)]
+
+        for k in range(location_count):
+            row_k = matrix[k]
+            predecessors_k = predecessors[k]
+            for i in range(location_count):
+                distance_i_k = matrix[i][k]
+                if distance_i_k == infinity or i == k:
+                    continue
+                row_i = matrix[i]
+                predecessors[i] = [predecessor_k if distance_i_k + through_k < direct else predecessor_i
+                                   for direct, through_k, predecessor_i, predecessor_k
+                                   in zip(row_i, row_k, predecessors[i], predecessors_k)]
+                matrix[i] = [direct if direct <= distance_i_k + through_k else distance_i_k + through_k
+                             for direct, through_k in zip(row_i, row_k)]
+
+        self.distances = array('f', [float('nan')]) * (location_count * (location_count - 1) // 2)
+        for i in range(location_count):
+            for j in range(i):
+                if matrix[i][j] != infinity:
+                    self.distances[self.edge_index(i, j)] = matrix[i][j]
+
+        self.predecessors = array('i')
+        for row in predecessors:
+            self.predecessors.extend(row)
+
+    # Time: O(1)    Space: O(1)
+    # Returns the distance stored in the packed triangle or infinity if the distance is missing.
+    def stored_distance(self, first_index, second_index):
+        distance = self.distances[self.edge_index(first_index, second_index)]
+        return distance if distance == distance else float('inf')
+
+    # Time: O(E log N)    Space: O(N)
+    # Runs Dijkstra's algorithm from the source location on a large road network. The most recent results are cached so
+    # the trips planned around the same locations do not search the graph again.
+    def dijkstra(self, source_index):
+        if source_index in self.dijkstra_cache:
+            self.dijkstra_cache.move_to_end(source_index)
+            return self.dijkstra_cache[source_index]
+
+        distances = {source_index: 0.0}
+        predecessors = {source_index: -1}
+        queue = [(0.0, source_index)]
+        while queue:
+            distance, index = heapq.heappop(queue)
+            if distance > distances[index]:
+                continue
+            for neighbor, miles in self.adjacency[index]:
+                new_distance = distance + miles
+                if neighbor not in distances or new_distance < distances[neighbor]:
+                    distances[neighbor] = new_distance
+                    predecessors[neighbor] = index
+                    heapq.heappush(queue, (new_distance, neighbor))
+
+        self.dijkstra_cache[source_index] = (distances, predecessors)
+        if len(self.dijkstra_cache) > dijkstra_cache_size:
+            self.dijkstra_cache.popitem(last=False)
+        return distances, predecessors
+
+    # Time: O(1)    Space: O(1)
+    # Returns the position of the distance between the two location indexes in the packed lower triangle. Row i of the
+    # triangle holds the i distances to the locations before it and starts after the i * (i - 1) / 2 entries of the
+    # rows above it.
+    @staticmethod
+    def edge_index(first_index, second_index):
+        if first_index < second_index:
+            first_index, second_index = second_index, first_index
+        return first_index * (first_index - 1) // 2 + second_index
+
     def location_name_from_address(self, address):
         for location in self.locations:
             if address == location.address:
@@ -53,25 +250,66 @@ class LocationGraph:
 
         return None
 
-    # This function will attempt to return the distance between 2 locations. Because the location distance data is
-    # reflective, if there doesn't exist a distance value from start to destination then there might exist a distance
-    # value from destination to start.
+    # Time: O(1)    Space: O(1)
+    # Returns the shortest number of miles between 2 locations or None if the destination cannot be reached. Because
+    # the location distance data is reflective, the distance from start to destination is the same as the distance from
+    # destination to start and both are read from the same packed triangle entry.
+    def miles_between(self, start, destination):
+        start_index = self.location_index[start]
+        destination_index = self.location_index[destination]
+        if start_index == destination_index:
+            return 0.0
+
+        if self.adjacency is not None:
+            distances = self.dijkstra(start_index)[0]
+            if destination_index not in distances:
+                return None
+            return round(distances[destination_index], distance_precision)
+
+        distance = self.distances[self.edge_index(start_index, destination_index)]
+        if distance != distance:
+            # This branch is unlikely to occur. NaN is the only value not equal to itself.
+            return None
+        return round(distance, distance_precision)
+
+    # Time: O(N)    Space: O(N)
+    # This function will attempt to return the shortest path between 2 locations. The path starts with the start
+    # location followed by a (location, miles so far) pair for every location passed through, ending with the
+    # destination and the total miles. None is returned if the destination cannot be reached.
     def distance_between(self, start, destination):
         shortest_path_to_destination = [start]
 
-        # Each node is reach able from either the start or destination node so both must be tested.
-        if destination in self.location_edges[start].keys():
-            shortest_path_to_destination.append((destination, self.location_edges[start][destination]))
-        elif start in self.location_edges[destination].keys():
-            shortest_path_to_destination.append((destination, self.location_edges[destination][start]))
-        else:
-            # This branch is unlikely to occur.
-            shortest_path_to_destination = None
+        start_index = self.location_index[start]
+        destination_index = self.location_index[destination]
+        if start_index == destination_index:
+            shortest_path_to_destination.append((destination, 0.0))
+            return shortest_path_to_destination
 
-        return shortest_path_to_destination
+        if self.miles_between(start, destination) is None:
+            return None
 
+        # Walk the predecessors back from the destination to rebuild the locations passed through.
+        location_count = len(self.locations)
+        hops = []
+        index = destination_index
+        while index != start_index:
+            hops.append(index)
+            if self.adjacency is not None:
+                index = self.dijkstra(start_index)[1][index]
+            elif self.predecessors is not None:
+                index = self.predecessors[start_index * location_count + index]
+            else:
+                index = start_index
+        hops.reverse()
 
-# TODO create a method to trim the location graph so that the nodes are all connected via the shortest path.
-# basically every location node will connect to one other node using the shortest distance between nodes.
-# This will trim down the complete graph into a connected graph.
+        previous_index = start_index
+        miles_so_far = 0.0
+        for index in hops:
+            miles_so_far += self.miles_between(self.locations[previous_index].name, self.locations[index].name)
+            shortest_path_to_destination.append((self.locations[index].name, round(miles_so_far, distance_precision)))
+            previous_index = index
 
+        # The last entry always carries the exact total so it matches miles_between.
+        shortest_path_to_destination[-1] = (destination, self.miles_between(start, destination))
+
+        return shortest_path_to_destination
@@ -1,11 +1,21 @@
 # Daryl Arouchian #000984402
 # C950 Task 1
 # Overall Time Complexity is O(N^2)
+import argparse
+import os
+import sys
+import threading
+import time as timer
 from datetime import datetime
 
+from Dispatcher import StreamingDispatcher, simulated_feed
+from EventLog import EventLogReader, EventLogWriter
 from Location import LocationGraph
-from PackageManager import PackageManager
-from Scheduler import Scheduler
+from PackageManager import PackageManager, print_package_lines
+from PlanBounds import optimality_gap
+from PlanCache import PlanCache
+from Scheduler import Scheduler, initial_time
+from TravelTimes import TravelTimeTable, load_speed_profile
 
 
 # Time: O(N) Space: O(1)
@@ -14,6 +24,9 @@ def change_time():
     """This function is used to change the time of the application and will run the execute plan function of the
     scheduler object """
 
+    # The time can only change once the plan is finished.
+    scheduler = background_planner.wait()
+
     hour = int(input("What time would you like to change to (Military Time)?\n\nHour (0-23): "))
     while hour not in range(0, 24):
         hour = int(input("Hour (0-23): "))
@@ -44,24 +57,246 @@ def print_all_package_info(pack_man):
     input("Press enter to continue.")
 
 
+# Time: O(K log K) Space: O(K)
+# Ask the user how the packages should be filtered and show the matching packages one page at a time.
+def filter_packages(pack_man):
+    filter_option = input("Filter packages by\n1) Late packages\n2) Packages on a truck\n3) Deadline before a time\n"
+                          "4) Status\n5) Address\n\nYour option: ")
+    while filter_option not in ("1", "2", "3", "4", "5"):
+        filter_option = input("Your option (1-5): ")
+
+    filters = {}
+    if filter_option == "1":
+        filters["late_at"] = datetime.strptime(current_time, "%H:%M")
+    elif filter_option == "2":
+        filters["truck"] = int(input("Truck number: "))
+    elif filter_option == "3":
+        hour = int(input("Hour (0-23): "))
+        while hour not in range(0, 24):
+            hour = int(input("Hour (0-23): "))
+
+        minute = int(input("Minute (0-59): "))
+        while minute not in range(0, 60):
+            minute = int(input("Minute (0-59): "))
+
+        filters["deadline_before"] = datetime.strptime(str(hour) + ":" + str(minute), "%H:%M")
+    elif filter_option == "4":
+        status_kinds = ["At HUB", "Delayed", "Wrong address", "In transit", "En route", "Delivered"]
+        for i in range(len(status_kinds)):
+            print(str(i + 1) + ") " + status_kinds[i])
+        status_number = int(input("Status: "))
+        while status_number not in range(1, len(status_kinds) + 1):
+            status_number = int(input("Status (1-" + str(len(status_kinds)) + "): "))
+        filters["status"] = status_kinds[status_number - 1]
+    else:
+        filters["address"] = input("Address: ").strip()
+
+    offset = 0
+    while True:
+        page = pack_man.query(offset=offset, limit=page_size, **filters)
+        if not page and offset == 0:
+            print("No packages match the filter.")
+            break
+        print("Package ID |      Address      |      City      | State |  Zip  | Deadline | Mass | Delivered | "
+              "Delivery Time | Delivered On Time | Status")
+        print_package_lines(page)
+        offset += len(page)
+        if len(page) < page_size or input("Press enter for the next page or q to stop. ").strip().lower() == "q":
+            break
+
+    input("Press enter to continue.")
+
+
+# Time: O(A * T * N^2) Space: O(N)
+# Dispatches the packages as if they arrived at the hub during the day and prints every trip as it is committed along
+# with a summary of the miles, late packages and the time taken per arrival.
+def run_streaming_dispatch(pack_man, graph, start_time, travel_times=None):
+    dispatcher = StreamingDispatcher(graph, start_time, travel_times=travel_times)
+    for arrival_time, package in simulated_feed(pack_man.packages.get_package_list(), start_time):
+        for truck_number, departure, package_ids in dispatcher.receive(arrival_time, package):
+            print(f"{arrival_time.time()} Truck {truck_number} leaves at {departure.time()} with {package_ids}")
+    for truck_number, departure, package_ids in dispatcher.finish():
+        print(f"End of feed Truck {truck_number} leaves at {departure.time()} with {package_ids}")
+
+    total_miles = sum(action.value[1] for action in dispatcher.actions
+                      if action.action_type in ("DeliveredPackage", "Returning"))
+    over_target = [latency for latency in dispatcher.latencies_ms if latency > dispatcher.latency_target_ms]
+    print(f"Total Mileage: {total_miles:.1f}")
+    print(f"Late Packages: {dispatcher.late_package_ids(pack_man)}")
+    print(f"Undelivered Packages: {dispatcher.undelivered_package_ids()}")
+    print(f"Arrival Latency: max {max(dispatcher.latencies_ms):.1f} ms, {len(over_target)} of "
+          f"{len(dispatcher.latencies_ms)} arrivals over the {dispatcher.latency_target_ms} ms target")
+
+
+class BackgroundPlanner:
+
+    # The background planner builds the scheduler on a separate thread so the menu can be shown while the deliveries
+    # are planned. Package lookups only need the package manager and work right away. Options that depend on the time
+    # wait for the scheduler. The scheduler works on a fork of the package manager, so the menu never reads packages
+    # while the thread is changing them, and the menu switches to the fork once planning is finished.
+    def __init__(self, pack_man, graph, event_log_name, **scheduler_arguments):
+        self.pack_man = pack_man
+        self.scheduler = None
+        self.error = None
+        self.started = timer.perf_counter()
+        self.finished = None
+        self.reported = False
+        self.stale_log_name = None
+        self.thread = threading.Thread(target=self.run, args=(pack_man.fork(), graph, event_log_name,
+                                                              scheduler_arguments), daemon=True)
+        self.thread.start()
+
+    # Time: O(N^2) Space: O(N^2)
+    # Plans the deliveries and replays the events of an earlier run before new events are appended to the log. A log
+    # written for a different plan cannot be replayed, so it is moved aside and a new log is started.
+    def run(self, pack_man, graph, event_log_name, scheduler_arguments):
+        try:
+            new_scheduler = Scheduler(pack_man, graph, **scheduler_arguments)
+            if event_log_name:
+                plan_digest = new_scheduler.plan_digest()
+                if os.path.exists(event_log_name):
+                    log_reader = EventLogReader(event_log_name)
+                    if log_reader.plan_digest() == plan_digest:
+                        replayed_actions, log_clock = log_reader.replay(pack_man, new_scheduler.trucks)
+                        new_scheduler.resume(replayed_actions, log_clock)
+                    else:
+                        self.stale_log_name = event_log_name + ".stale"
+                        os.replace(event_log_name, self.stale_log_name)
+                new_scheduler.event_log = EventLogWriter(event_log_name, plan_digest)
+            self.scheduler = new_scheduler
+        except Exception as error:
+            self.error = error
+        finally:
+            self.finished = timer.perf_counter()
+
+    def ready(self):
+        return not self.thread.is_alive()
+
+    # Time: O(1) Space: O(1)
+    # Returns the package manager the menu reads. Until planning is finished this is the package manager as read from
+    # the package file, afterwards it is the one the scheduler keeps up to date.
+    def package_manager(self):
+        if self.ready() and self.scheduler is not None:
+            return self.scheduler.package_manager
+        return self.pack_man
+
+    def elapsed_seconds(self):
+        return (self.finished or timer.perf_counter()) - self.started
+
+    # Time: O(1) Space: O(1)
+    # Shows a progress indicator until the plan is finished and returns the scheduler.
+    def wait(self):
+        spinner = "|/-\\"
+        frame = 0
+        while self.thread.is_alive():
+            sys.stdout.write(f"\rPlanning the deliveries {spinner[frame % len(spinner)]} "
+                             f"{self.elapsed_seconds():.1f} s")
+            sys.stdout.flush()
+            frame += 1
+            self.thread.join(0.1)
+        if frame:
+            sys.stdout.write("\n")
+
+        if self.error is not None:
+            raise self.error
+        return self.scheduler
+
+
+# Time: O(T) Space: O(1)
+# Prints the time and the truck mileage. While the plan is still being built a progress line is printed instead. The
+# first time the plan is found finished the packages that cannot meet their deadline are listed.
+def print_status():
+    global current_time
+    if not background_planner.ready():
+        print("Current Time: " + current_time)
+        print(f"Planning the deliveries... {background_planner.elapsed_seconds():.1f} s so far. Changing the time is "
+              f"available once planning finishes.")
+        return
+
+    scheduler = background_planner.wait()
+    if not background_planner.reported:
+        background_planner.reported = True
+        # The time may have moved forward if an event log was replayed.
+        current_time = scheduler.current_time.strftime("%H:%M")
+        print(f"Planning finished in {background_planner.elapsed_seconds():.2f} s")
+        if background_planner.stale_log_name:
+            print(f"Warning: the event log was written for a different plan and was not replayed. It was moved to "
+                  f"{background_planner.stale_log_name} and a new log was started.")
+        # Warn about packages that will be late in any plan since they cannot even be reached by their deadline.
+        for flagged_package, earliest_delivery in scheduler.infeasible_packages:
+            earliest_string = str(earliest_delivery.time()) if earliest_delivery else "never"
+            print(f"Warning: package {flagged_package.package_id} cannot meet its deadline of "
+                  f"{flagged_package.constraints['Deadline'].time()}. Earliest delivery: {earliest_string}")
+        # Packages that could not be planned by their deadline are delivered late, or not at all if no truck can take
+        # them.
+        for late_package, delivery_time in scheduler.late_packages():
+            if delivery_time is None:
+                print(f"Warning: package {late_package.package_id} could not be planned for delivery")
+            else:
+                print(f"Warning: package {late_package.package_id} is planned for delivery at {delivery_time.time()}, "
+                      f"after its deadline of {late_package.constraints['Deadline'].time()}")
+
+    print("Current Time: " + current_time)
+    for truck in scheduler.trucks.values():
+        print("Truck " + str(truck.number) + " Mileage: " + str(truck.miles_traveled))
+    planned_miles = scheduler.planned_miles()
+    print(f"Planned Mileage: {planned_miles:.1f} | Lower Bound: {scheduler.mileage_lower_bound:.1f} | "
+          f"Optimality Gap: {optimality_gap(planned_miles, scheduler.mileage_lower_bound):.1f}%")
+
+
+# Number of packages shown on each page of a filtered listing.
+page_size = 20
+
 # --- Start of Application ---
+application_started = timer.perf_counter()
+argument_parser = argparse.ArgumentParser(description="WGUPS package delivery planner")
+argument_parser.add_argument("--no-plan-cache", action="store_true",
+                             help="ignore the cached plan and plan the deliveries again")
+argument_parser.add_argument("--improve-ms", type=int, default=0,
+                             help="milliseconds spent improving the delivery plan in the background")
+argument_parser.add_argument("--event-log", default=None,
+                             help="JSON lines file every delivery event is appended to. An existing log is replayed "
+                                  "first so the application resumes where it stopped")
+argument_parser.add_argument("--stream", action="store_true",
+                             help="dispatch the packages trip by trip as they arrive during the day, using the package "
+                                  "file as a simulated feed, then exit")
+argument_parser.add_argument("--speed-profile", default=None,
+                             help="CSV file of the driving speeds through the day. Speed rows (time, mph) set the "
+                                  "speed of every road and Zone rows (location, time, mph) the speed around a location")
+arguments = argument_parser.parse_args()
+
 location_graph = LocationGraph()
 
 package_manager = PackageManager()
 
+# Time: O(B * N^2) Space: O(B * N^2)
+# The travel time table is built once up front. Without a speed profile every road is driven at the constant speed.
+start_time = datetime.strptime(initial_time, "%I:%M %p")
+if arguments.speed_profile:
+    speed_changes, zone_changes = load_speed_profile(arguments.speed_profile)
+    travel_times = TravelTimeTable(location_graph, start_time, speed_changes, zone_changes)
+else:
+    travel_times = TravelTimeTable(location_graph, start_time)
+
+if arguments.stream:
+    run_streaming_dispatch(package_manager, location_graph, start_time, travel_times)
+    raise SystemExit
+
 # Time: O(N^2) Space: O(N^2)
-scheduler = Scheduler(package_manager, location_graph)
+# The plan is built in the background while the menu is already usable.
+background_planner = BackgroundPlanner(package_manager, location_graph, arguments.event_log, plan_cache=PlanCache(),
+                                       bypass_cache=arguments.no_plan_cache, improve_ms=arguments.improve_ms,
+                                       travel_times=travel_times)
 
-current_time = "8:00"
+current_time = datetime.strptime(initial_time, "%I:%M %p").strftime("%H:%M")
 # set the reoccurring prompt up.
 input_prompt = "\n" + "Please type the number next to the option you would like " \
                       "to perform\n1) Change the current time\n2) Lookup Package " \
-                      "by ID\n3) Print All Packages\n4) Quit\n\n" \
+                      "by ID\n3) Print All Packages\n4) Filter Packages\n5) Quit\n\n" \
                       "Your option: "
 
-print("Current Time: " + current_time)
-print("Truck 1 Mileage: " + str(scheduler.truck1.miles_traveled))
-print("Truck 2 Mileage: " + str(scheduler.truck2.miles_traveled))
+print_status()
+print(f"Time to first prompt: {timer.perf_counter() - application_started:.2f} s")
 
 current_option = input(input_prompt)
 
@@ -70,7 +305,7 @@ while not current_option.isdigit():
     current_option = input("Input must be a number: ")
 
 # Check for the quit option to end the application loop.
-while int(current_option) != 4:
+while int(current_option) != 5:
 
     current_int_option = int(current_option)
 
@@ -80,16 +315,18 @@ while int(current_option) != 4:
 
     # Lookup a single package and display its status on the screen.
     if current_int_option == 2:
-        lookup_package(package_manager)
+        lookup_package(background_planner.package_manager())
 
     # Show all package status information on the screen.
     if current_int_option == 3:
-        print_all_package_info(package_manager)
+        print_all_package_info(background_planner.package_manager())
+
+    # Show the packages matching a filter one page at a time.
+    if current_int_option == 4:
+        filter_packages(background_planner.package_manager())
 
     # Repeat the status information and the input prompt.
-    print("Current Time: " + current_time)
-    print("Truck 1 Mileage: " + str(scheduler.truck1.miles_traveled))
-    print("Truck 2 Mileage: " + str(scheduler.truck2.miles_traveled))
+    print_status()
     current_option = input(input_prompt)
     while not current_option.isdigit():
         current_option = input("Input must be a number: ")
@@ -1,6 +1,81 @@
+import copy
+import csv
+import os
+import re
+import sys
+from bisect import bisect_left, insort
 from datetime import datetime
+from functools import lru_cache
 from operator import attrgetter
 
+package_file_name = 'WGUPS Package File.csv'
+# Lists the corrected address of every package whose special note says its address is wrong, along with the time the
+# correction is known.
+address_corrections_file_name = 'WGUPS Address Corrections.csv'
+
+
+# Time: O(1) Space: O(1)
+# Parses a time such as "10:30 AM". There are only a handful of distinct times in the package data, so every result is
+# kept and reused. datetime objects cannot be changed, which makes sharing them safe.
+@lru_cache(maxsize=None)
+def parse_time(time_string):
+    return datetime.strptime(time_string.strip().upper(), "%I:%M %p")
+
+
+def truck_rule(package, match, address_correction):
+    package.constraints["Truck"] = int(match.group(1))
+
+
+def delivered_with_rule(package, match, address_correction):
+    package.constraints["Delivered_With"] = [int(package_id) for package_id in re.findall(r"\d+", match.group(1))]
+
+
+def delayed_rule(package, match, address_correction):
+    package.constraints["Delayed"] = parse_time(match.group(1))
+    package.status = "Delayed on flight."
+
+
+# The corrected address is read from the note itself when it has one, such as "Wrong address listed---corrected to
+# 410 S State St., Salt Lake City, UT 84111 at 10:20 AM", otherwise from the address corrections file. A wrong address
+# without a known correction keeps the listed address.
+def wrong_address_rule(package, match, address_correction):
+    if match.group(1) is not None:
+        address_correction = (match.group(1).strip(), match.group(2))
+    package.status = "Wrong address provided. Will be updated soon."
+    if address_correction is not None:
+        package.constraints["Wrong"] = address_correction[0]
+        package.constraints["Delayed"] = parse_time(address_correction[1])
+
+
+# The special notes rule table. Each rule is a compiled pattern and the function that turns a match into package
+# constraints. Every rule that matches a note is applied, so a new kind of note only needs a new row here.
+note_rules = [
+    (re.compile(r"Can only be on truck\s*(\d+)", re.IGNORECASE), truck_rule),
+    (re.compile(r"Must be delivered with\s*([\d,\s]+)", re.IGNORECASE), delivered_with_rule),
+    (re.compile(r"Delayed on flight.*until\s*(\d{1,2}:\d{2}\s*[AP]M)", re.IGNORECASE), delayed_rule),
+    (re.compile(r"Wrong address listed(?:.*corrected to\s*(.+?)\s+at\s+(\d{1,2}:\d{2}\s*[AP]M))?", re.IGNORECASE),
+     wrong_address_rule),
+]
+
+
+# Time: O(C) Space: O(C)
+# Reads the address corrections file into a dictionary from package ID to the corrected address, written as
+# "address, city, state zip", and the time the correction is known. A missing file means there are no corrections.
+def load_address_corrections(file_name=address_corrections_file_name):
+    address_corrections = {}
+    if not os.path.exists(file_name):
+        return address_corrections
+
+    with open(file_name, 'r', encoding='UTF-8', newline='') as corrections_file:
+        rows = csv.reader(corrections_file)
+        next(rows, None)
+        for row in rows:
+            if len(row) < 6:
+                continue
+            corrected_address = f"{row[1].strip()}, {row[2].strip()}, {row[3].strip()} {row[4].strip()}"
+            address_corrections[int(row[0])] = (corrected_address, row[5].strip())
+    return address_corrections
+
 
 class PackageHashTable:
     default_size = 40
@@ -13,8 +88,10 @@ class PackageHashTable:
         if type(item) is Package:
             self.hash_table[int(item.package_id) % self.size].append(item)
 
-    def add_package(self, package_id, address, city, state, package_zip, delivery_deadline, mass, special_notes):
-        package = Package(package_id, address, city, state, package_zip, delivery_deadline, mass, special_notes)
+    def add_package(self, package_id, address, city, state, package_zip, delivery_deadline, mass, special_notes,
+                    address_correction=None):
+        package = Package(package_id, address, city, state, package_zip, delivery_deadline, mass, special_notes,
+                          address_correction)
         self.add_package_obj(package)
 
     def remove_package(self, package_id):
@@ -28,6 +105,22 @@ class PackageHashTable:
                 return package
         return None
 
+    # Time: O(1) Space: O(1)
+    # Puts the package in the place of the package with the same package ID.
+    def replace_package(self, package):
+        list_in_slot = self.hash_table[package.package_id % self.size]
+        for index in range(len(list_in_slot)):
+            if list_in_slot[index].package_id == package.package_id:
+                list_in_slot[index] = package
+                return
+
+    # Time: O(N) Space: O(N)
+    # Returns a new hash table holding the same package objects.
+    def copy(self):
+        table_copy = PackageHashTable(self.size)
+        table_copy.hash_table = [list_in_slot.copy() for list_in_slot in self.hash_table]
+        return table_copy
+
     def get_package_list(self):
         # Hold all packages in a sequential list.
         list_of_all_packages = []
@@ -40,7 +133,10 @@ class PackageHashTable:
 
 class Package:
 
-    def __init__(self, package_id, address, city, state, package_zip, delivery_deadline, mass, special_notes):
+    # address_correction is the corrected address and the time it is known, used when the special notes say the address
+    # is wrong without giving the correction.
+    def __init__(self, package_id, address, city, state, package_zip, delivery_deadline, mass, special_notes,
+                 address_correction=None):
         # Basic package information
         self.package_id = int(package_id)
         self.address = address
@@ -54,40 +150,33 @@ class Package:
         self.delivered = False
         self.delivery_time = None
         self.status = "At HUB"
+        self.truck = None
 
         # Every package has a deadline. Some are just at the end of the day. Because they are at the end of the day
         # they still need to be initialized but can be set to None.
         if delivery_deadline != "EOD":
-            self.constraints["Deadline"] = datetime.strptime(delivery_deadline, "%I:%M %p")
+            self.constraints["Deadline"] = parse_time(delivery_deadline)
         else:
             self.constraints["Deadline"] = None
 
         # package constraints a parsed at this step of the package creation process. This puts the special notes into a
         # format that the scheduler class and process and plan from.
-        if "Can only be on" in special_notes:
-            self.constraints["Truck"] = int(special_notes.partition("truck")[2])
-        elif "Must be delivered with" in special_notes:
-            extracted_packages = str(special_notes).partition("with")[2].strip().strip('"')
-            extracted_packages = extracted_packages.split(",")
-            packages = []
-            for pack in extracted_packages:
-                packages += [int(pack)]
-            self.constraints["Delivered_With"] = packages
-        elif "Delayed on flight" in special_notes:
-            extracted_time_str = str(special_notes).partition("until")[2].strip()
-            extracted_time = datetime.strptime(extracted_time_str, "%I:%M %p")
-            self.constraints["Delayed"] = extracted_time
-            self.status = "Delayed on flight."
-        elif "Wrong" in special_notes:
-            self.constraints["Delayed"] = datetime.strptime("10:20 AM", "%I:%M %p")
-            self.constraints["Wrong"] = "410 S State St., Salt Lake City, UT 84111"
-            self.status = "Wrong address provided. Will be updated soon."
+        if special_notes:
+            for pattern, rule in note_rules:
+                match = pattern.search(special_notes)
+                if match:
+                    rule(self, match, address_correction)
 
     # Time: O(1)    Space: O(1)
     # This function is used to print the package information onto the standard output in a predetermined format. It
     # matches the header information in the printer operations of the Main.py class. There is an attempt to make the
     # columns line up as much as possible.
     def print_info(self):
+        print(self.info_line())
+
+    # Time: O(1)    Space: O(1)
+    # Returns the line printed by print_info so many packages can be written to the output at once.
+    def info_line(self):
         deadline_value = str(self.constraints["Deadline"].time()) if self.constraints["Deadline"] else "None"
         delivery_time_string = str(self.delivery_time.time()) if self.delivery_time else "N/A"
         delivered_value = "True" if self.delivered else "False"
@@ -99,18 +188,44 @@ class Package:
                 elif self.delivery_time < self.constraints["Deadline"]:
                     delivered_on_time = "TRUE"
 
-        print(f"{str(self.package_id):^10} | {self.address:^17} | {self.city:^4} | {self.state:^5} | "
-              f"{self.package_zip:^3} | {deadline_value:^8} | {self.mass:^4} | {delivered_value:^9} | "
-              f"{delivery_time_string:^13} | {delivered_on_time:^13} | {self.status:^6}")
+        return (f"{str(self.package_id):^10} | {self.address:^17} | {self.city:^4} | {self.state:^5} | "
+                f"{self.package_zip:^3} | {deadline_value:^8} | {self.mass:^4} | {delivered_value:^9} | "
+                f"{delivery_time_string:^13} | {delivered_on_time:^13} | {self.status:^6}")
+
+    # Time: O(1)    Space: O(1)
+    # Returns the kind of status the package is in. Status messages include truck numbers and times so the kind is used
+    # to group packages with the same status.
+    def status_kind(self):
+        if self.delivered:
+            return "Delivered"
+        for kind in ("In transit", "En route", "Delayed", "Wrong address"):
+            if self.status.startswith(kind):
+                return kind
+        return "At HUB"
+
+    # Time: O(1)    Space: O(1)
+    # Returns True if the package was delivered after its deadline, or if it is still undelivered and its deadline is
+    # before the given time.
+    def is_late(self, current_time=None):
+        deadline = self.constraints["Deadline"]
+        if deadline is None:
+            return False
+        if self.delivery_time is not None:
+            return self.delivery_time > deadline
+        return current_time is not None and current_time > deadline
 
 
 class PackageManager:
 
     # Time: O(N^2) Space: O(N)
     # This function will import the package information from the WGUPS Package File.csv, create package objects for
-    # each package entry, and will place all packages into the package hashtable object.
-    def __init__(self):
-        package_file = open('WGUPS Package File.csv', 'r', encoding='UTF-8')
+    # each package entry, and will place all packages into the package hashtable object. Wrong addresses are corrected
+    # from the address corrections file.
+    def __init__(self, file_name=package_file_name, corrections_file_name=address_corrections_file_name):
+        self.file_name = file_name
+        self.corrections_file_name = corrections_file_name
+        address_corrections = load_address_corrections(corrections_file_name)
+        package_file = open(file_name, 'r', encoding='UTF-8')
 
         self.constraints_on_packages = {"Delayed": [], "Wrong": [], "Deadline": [], "Delivered_With": [], "Truck": []}
 
@@ -128,10 +243,12 @@ class PackageManager:
             if len(package_fields) == 9:
                 package = Package(package_fields[0], package_fields[1], package_fields[2], package_fields[3],
                                   package_fields[4], package_fields[5], package_fields[6],
-                                  package_fields[7] + "," + package_fields[8])
+                                  package_fields[7] + "," + package_fields[8],
+                                  address_corrections.get(int(package_fields[0])))
             else:
                 package = Package(package_fields[0], package_fields[1], package_fields[2], package_fields[3],
-                                  package_fields[4], package_fields[5], package_fields[6], package_fields[7])
+                                  package_fields[4], package_fields[5], package_fields[6], package_fields[7],
+                                  address_corrections.get(int(package_fields[0])))
 
             self.packages.add_package_obj(package)
 
@@ -141,10 +258,158 @@ class PackageManager:
         # to calculate all hidden constraints to make them obvious to the scheduler.
         self.gather_constraints()
 
+        self.build_indexes()
+
+        # Package objects are shared with forks of the package manager. Once forked a package is copied before its first
+        # change, and owned_ids holds the packages that have been copied and may be changed in place.
+        self.copy_on_write = False
+        self.owned_ids = set(list())
+
+    # Time: O(N log N) Space: O(N)
+    # Builds the secondary indexes used by the package queries. Each index maps a value to the set of package IDs that
+    # have it, and the deadline index is a sorted list of (deadline, package ID) pairs. The indexes are kept up to date
+    # by the update functions below, which the scheduler uses whenever it changes a package.
+    def build_indexes(self):
+        self.sorted_package_ids = []
+        self.status_index = {}
+        self.truck_index = {}
+        self.address_index = {}
+        self.late_delivery_ids = set(list())
+        self.deadline_index = []
+        for package in self.packages.get_package_list():
+            self.sorted_package_ids.append(package.package_id)
+            self.status_index.setdefault(package.status_kind(), set(list())).add(package.package_id)
+            self.address_index.setdefault(package.address, set(list())).add(package.package_id)
+            if package.constraints["Deadline"]:
+                self.deadline_index.append((package.constraints["Deadline"], package.package_id))
+        self.deadline_index.sort()
+
+    # Time: O(1) Space: O(1)
+    # Moves the package ID from one set of an index to another.
+    @staticmethod
+    def move_in_index(index, package_id, old_value, new_value):
+        if old_value == new_value:
+            return
+        if old_value is not None:
+            index[old_value].discard(package_id)
+        if new_value is not None:
+            index.setdefault(new_value, set(list())).add(package_id)
+
+    # Time: O(N) Space: O(N)
+    # Returns a package manager that starts with the same package status and can be changed on its own. The package
+    # objects and constraints are shared and the indexes are copied. Packages are copied the first time either package
+    # manager changes them through writable_package.
+    def fork(self):
+        forked = copy.copy(self)
+        forked.packages = self.packages.copy()
+        forked.sorted_package_ids = self.sorted_package_ids.copy()
+        forked.status_index = {kind: package_ids.copy() for kind, package_ids in self.status_index.items()}
+        forked.truck_index = {truck: package_ids.copy() for truck, package_ids in self.truck_index.items()}
+        forked.address_index = {address: package_ids.copy() for address, package_ids in self.address_index.items()}
+        forked.late_delivery_ids = self.late_delivery_ids.copy()
+        forked.deadline_index = self.deadline_index.copy()
+
+        self.copy_on_write = True
+        self.owned_ids = set(list())
+        forked.copy_on_write = True
+        forked.owned_ids = set(list())
+        return forked
+
+    # Time: O(1) Space: O(1)
+    # Returns the package with the package ID so it can be changed. A package shared with a fork is copied first.
+    def writable_package(self, package_id):
+        package = self.packages.get_package(package_id)
+        if package is None or not self.copy_on_write or package_id in self.owned_ids:
+            return package
+
+        package = copy.copy(package)
+        self.packages.replace_package(package)
+        self.owned_ids.add(package_id)
+        return package
+
     # Time: O(N) Space: O(1)
+    # Adds a new package after the package file was read, for example to try a what-if variant of the day on a fork.
+    # The scheduler has to plan again before the package is delivered.
+    def add_package(self, package):
+        self.packages.add_package_obj(package)
+        self.owned_ids.add(package.package_id)
+        insort(self.sorted_package_ids, package.package_id)
+        self.status_index.setdefault(package.status_kind(), set(list())).add(package.package_id)
+        self.address_index.setdefault(package.address, set(list())).add(package.package_id)
+        if package.constraints["Deadline"]:
+            insort(self.deadline_index, (package.constraints["Deadline"], package.package_id))
+
+    # Time: O(1) Space: O(1)
+    def update_status(self, package, status):
+        old_kind = package.status_kind()
+        package.status = status
+        self.move_in_index(self.status_index, package.package_id, old_kind, package.status_kind())
+
+    # Time: O(1) Space: O(1)
+    # Records the truck the package is on, or None once it is off the truck.
+    def update_truck(self, package, truck_number):
+        self.move_in_index(self.truck_index, package.package_id, package.truck, truck_number)
+        package.truck = truck_number
+
+    # Time: O(1) Space: O(1)
+    # Marks the package as delivered at the delivery time, or as undelivered if the delivery time is None.
+    def update_delivery(self, package, delivery_time):
+        old_kind = package.status_kind()
+        package.delivered = delivery_time is not None
+        package.delivery_time = delivery_time
+        self.move_in_index(self.status_index, package.package_id, old_kind, package.status_kind())
+
+        if package.is_late():
+            self.late_delivery_ids.add(package.package_id)
+        else:
+            self.late_delivery_ids.discard(package.package_id)
+
+    # Time: O(1) Space: O(1)
+    def update_address(self, package, address, city, state, package_zip):
+        self.move_in_index(self.address_index, package.package_id, package.address, address)
+        package.address = address
+        package.city = city
+        package.state = state
+        package.package_zip = package_zip
+
+    # Time: O(K log K) Space: O(K)
+    # Returns the packages matching every filter given, sorted by package ID, where K is the size of the smallest
+    # matching index. status is a status kind, truck is the truck the package is on, deadline_before returns packages
+    # with a deadline before that time, and late_at returns packages that are late at that time. offset and limit
+    # select a page of the result.
+    def query(self, status=None, truck=None, deadline_before=None, address=None, late_at=None, offset=0, limit=None):
+        candidate_sets = []
+        if status is not None:
+            candidate_sets.append(self.status_index.get(status, set(list())))
+        if truck is not None:
+            candidate_sets.append(self.truck_index.get(truck, set(list())))
+        if address is not None:
+            candidate_sets.append(self.address_index.get(address, set(list())))
+        if deadline_before is not None:
+            end = bisect_left(self.deadline_index, (deadline_before, -1))
+            candidate_sets.append(set(package_id for deadline, package_id in self.deadline_index[:end]))
+        if late_at is not None:
+            # Packages delivered late are always late. Undelivered packages are late once their deadline has passed.
+            end = bisect_left(self.deadline_index, (late_at, -1))
+            delivered_ids = self.status_index.get("Delivered", set(list()))
+            late_ids = set(package_id for deadline, package_id in self.deadline_index[:end]
+                           if package_id not in delivered_ids)
+            candidate_sets.append(late_ids | self.late_delivery_ids)
+
+        if candidate_sets:
+            candidate_sets.sort(key=len)
+            matching_ids = sorted(package_id for package_id in candidate_sets[0]
+                                  if all(package_id in other_set for other_set in candidate_sets[1:]))
+        else:
+            matching_ids = self.sorted_package_ids
+
+        end = None if limit is None else offset + limit
+        return [self.packages.get_package(package_id) for package_id in matching_ids[offset:end]]
+
+    # Time: O(N) Space: O(N)
+    # Writes the information of every package to the output in a single write.
     def print_all_package_info(self):
-        for package in self.packages.get_package_list():
-            package.print_info()
+        print_package_lines(self.query())
 
     # Time: O(N^2) Space: O(N)
     # This function will create a dictionary of constraints and will place the packages with the corresponding
@@ -212,8 +477,8 @@ class PackageManager:
                             break
 
     # Time: O(N) Space: O(N)
-    # Creates a list of packages ordered by priority.
-    def priority_list(self):
+    # Creates a list of packages ordered by priority. Only the given packages are used when a list of them is provided.
+    def priority_list(self, packages=None):
         # Highest Priority
         deadline_and_delayed = []
         deadline_and_delayed_set = set(list())
@@ -229,7 +494,7 @@ class PackageManager:
         end_of_day = []
 
         # Parse each package for constraints.
-        for package in self.packages.get_package_list():
+        for package in self.packages.get_package_list() if packages is None else packages:
             if "Delayed" in package.constraints.keys() and package.constraints["Deadline"]:
                 deadline_and_delayed.append(package)
                 deadline_and_delayed_set.add(package.address)
@@ -256,3 +521,12 @@ class PackageManager:
 
         # Combine all list in order of priority
         return deadline_and_delayed, delivered_with + deadlines, end_of_day
+
+
+# Time: O(N) Space: O(N)
+# Builds the lines for all the packages first and writes them to the output at once, which is much faster than a print
+# call for every package on large listings.
+def print_package_lines(packages):
+    if packages:
+        sys.stdout.write("\n".join(package.info_line() for package in packages) + "\n")
+        sys.stdout.flush()
@@ -0,0 +1,67 @@
+from Stop import resolved_address
+
+
+# Time: O(N * H) Space: O(N)
+# Returns the packages that cannot meet their deadline even if a truck drove straight from the nearest hub to them the
+# moment they arrive at the hub, paired with the earliest time they could be delivered. A package without a known
+# location is returned with no time. Packages on this list will be late in any plan, so the planner cannot be blamed
+# for them. Driving times come from the travel time table.
+def infeasible_packages(packages, location_graph, travel_times, start_time):
+    flagged_packages = []
+    for package in packages:
+        deadline = package.constraints["Deadline"]
+        if deadline is None:
+            continue
+
+        location_name = location_graph.location_name_from_address(resolved_address(package))
+        hub = None if location_name is None else location_graph.nearest_hub(location_name)
+        if hub is None:
+            flagged_packages.append((package, None))
+            continue
+
+        release_time = max(start_time, package.constraints.get("Delayed", start_time))
+        earliest_delivery = travel_times.arrival_time(hub, location_name, release_time)
+        if earliest_delivery > deadline:
+            flagged_packages.append((package, earliest_delivery))
+
+    return flagged_packages
+
+
+# Time: O(L^2 + L * H) Space: O(L)
+# Returns a lower bound on the miles the whole fleet has to drive to deliver the packages. Every trip is a loop that
+# starts at a hub, so together the trips connect the hubs to every destination and can never be shorter than a minimum
+# spanning tree over those locations where the hubs count as one location, which is found with Prim's algorithm. The
+# destination farthest from every hub also has to be reached and left again, which gives a second bound, and the larger
+# of the two is returned.
+def mileage_lower_bound(packages, location_graph):
+    locations = set(list())
+    for package in packages:
+        location_name = location_graph.location_name_from_address(resolved_address(package))
+        if location_name is not None and location_graph.nearest_hub(location_name) is not None:
+            locations.add(location_name)
+    locations.difference_update(location_graph.hubs.keys())
+    if not locations:
+        return 0.0
+
+    # Each location outside the tree keeps the cheapest edge that connects it to the tree, which starts with the hubs.
+    connect_miles = {location: location_graph.miles_between(location_graph.nearest_hub(location), location)
+                     for location in locations}
+    farthest_round_trip = 2 * max(connect_miles.values())
+    tree_miles = 0.0
+    while connect_miles:
+        nearest_location = min(connect_miles, key=connect_miles.get)
+        tree_miles += connect_miles.pop(nearest_location)
+        for location in connect_miles.keys():
+            miles = location_graph.miles_between(nearest_location, location)
+            if miles is not None and miles < connect_miles[location]:
+                connect_miles[location] = miles
+
+    return max(tree_miles, farthest_round_trip)
+
+
+# Time: O(1) Space: O(1)
+# Returns how far the planned miles are above the lower bound as a percentage of the planned miles.
+def optimality_gap(planned_miles, lower_bound):
+    if planned_miles <= 0:
+        return 0.0
+    return max(0.0, (planned_miles - lower_bound) / planned_miles * 100)
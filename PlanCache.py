@@ -0,0 +1,97 @@
+import hashlib
+import json
+import os
+from datetime import datetime
+
+from Scheduler import Action
+
+# Bump this number whenever the planning code changes in a way that makes older cached plans invalid.
+plan_cache_version = 4
+default_cache_directory = ".plan_cache"
+default_max_entries = 32
+default_max_bytes = 16 * 1024 * 1024
+
+
+class PlanCache:
+
+    # The plan cache stores the scheduled actions of a plan on disk. Each plan is stored in its own file named after a
+    # hash of everything the plan depends on so a changed input file or parameter always results in a new plan.
+    def __init__(self, directory=default_cache_directory, max_entries=default_max_entries,
+                 max_bytes=default_max_bytes):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+    # Time: O(N) Space: O(1)
+    # Creates the cache key from the contents of the input files and the planning parameters.
+    def plan_key(self, file_names, parameters):
+        digest = hashlib.sha256()
+        digest.update(str(plan_cache_version).encode("UTF-8"))
+        for file_name in file_names:
+            with open(file_name, "rb") as input_file:
+                digest.update(input_file.read())
+        for parameter in parameters:
+            digest.update(repr(parameter).encode("UTF-8"))
+        return digest.hexdigest()
+
+    def entry_path(self, key):
+        return os.path.join(self.directory, key + ".json")
+
+    # Time: O(N) Space: O(N)
+    # Returns the list of actions stored under the key or None if there is no usable entry. Reading an entry marks it
+    # as recently used so it is the last to be evicted.
+    def load(self, key):
+        path = self.entry_path(key)
+        try:
+            with open(path, "r", encoding="UTF-8") as cache_file:
+                stored_actions = json.load(cache_file)
+        except (OSError, ValueError):
+            return None
+
+        os.utime(path)
+
+        actions = []
+        for action_type, time, value in stored_actions:
+            actions.append(Action(action_type, datetime.fromisoformat(time), tuple(value)))
+        return actions
+
+    # Time: O(N) Space: O(N)
+    # Writes the actions to the cache under the key and then evicts old entries. The entry is written to a temporary
+    # file first so a crash never leaves a partially written plan behind.
+    def store(self, key, actions):
+        os.makedirs(self.directory, exist_ok=True)
+
+        stored_actions = [[action.action_type, action.time.isoformat(), action.value] for action in actions]
+
+        path = self.entry_path(key)
+        temporary_path = path + ".tmp"
+        with open(temporary_path, "w", encoding="UTF-8") as cache_file:
+            json.dump(stored_actions, cache_file)
+        os.replace(temporary_path, path)
+
+        self.evict()
+
+    # Time: O(N log N) Space: O(N)
+    # Removes the least recently used entries until the cache is within its entry and size limits.
+    def evict(self):
+        entries = []
+        for file_name in os.listdir(self.directory):
+            if file_name.endswith(".json"):
+                path = os.path.join(self.directory, file_name)
+                entry_stat = os.stat(path)
+                entries.append((entry_stat.st_mtime, entry_stat.st_size, path))
+
+        entries.sort()
+        total_bytes = sum(entry[1] for entry in entries)
+        while entries and (len(entries) > self.max_entries or total_bytes > self.max_bytes):
+            modified_time, size, path = entries.pop(0)
+            os.remove(path)
+            total_bytes -= size
+
+    # Removes every entry from the cache.
+    def clear(self):
+        if not os.path.isdir(self.directory):
+            return
+        for file_name in os.listdir(self.directory):
+            if file_name.endswith(".json"):
+                os.remove(os.path.join(self.directory, file_name))
@@ -0,0 +1,216 @@
+import math
+import random
+import time as timer
+
+from Location import default_hub_location
+from TripBuilder import RegretInsertionBuilder
+from Truck import Truck
+
+# Largest number of units removed from the plan in a single ruin step.
+max_ruin_size = 6
+# Starting temperature of the annealing acceptance as a fraction of the starting plan mileage.
+starting_temperature_ratio = 0.02
+# Arrivals must beat a deadline by at least this many hours. This covers the rounding of the delivery times the
+# scheduler creates from the plan.
+deadline_margin_hours = 1e-8
+
+
+class PlanImprover:
+
+    # The plan improver takes a finished day plan and keeps improving it until its time budget runs out. A day plan is
+    # a dictionary from truck number to the list of trips that truck drives, and each trip is a list of stops in
+    # visiting order. The improver uses ruin and recreate: a few units are removed from the plan and inserted again
+    # at the cheapest positions of any truck and trip. The result is accepted with a simulated annealing rule so the
+    # search can leave local minimums. The best plan seen so far is always kept and returned. Every truck of the plan
+    # is based at the hub.
+    def __init__(self, location_graph, travel_times, capacity=Truck.capacity, seed=None, hub=default_hub_location,
+                 mass_capacity=Truck.mass_capacity):
+        self.location_graph = location_graph
+        self.hub = hub
+        self.travel_times = travel_times
+        self.start_time = travel_times.start_time
+        self.capacity = capacity
+        self.mass_capacity = mass_capacity
+        self.random = random.Random(seed)
+        self.stop_hours = {}
+
+    # Time: O(1) Space: O(1)
+    # Returns the release and deadline of the stop as hours after the start time. Missing values are infinite.
+    def hours_of(self, stop):
+        if stop not in self.stop_hours:
+            release_hours = -math.inf
+            if "Delayed" in stop.constraints.keys():
+                release_hours = (stop.constraints["Delayed"] - self.start_time).total_seconds() / 3600
+            deadline_hours = math.inf
+            if stop.constraints["Deadline"]:
+                deadline_hours = (stop.constraints["Deadline"] - self.start_time).total_seconds() / 3600
+            self.stop_hours[stop] = (release_hours, deadline_hours)
+        return self.stop_hours[stop]
+
+    # Time: O(N) Space: O(1)
+    # Drives every trip of the truck in order and returns the total miles, or None if a capacity, truck restriction or
+    # deadline would be broken. Each trip leaves the hub when the truck is back and every package on it has arrived.
+    def truck_miles(self, truck_number, trips):
+        truck_hours = 0.0
+        total_miles = 0.0
+        for trip in trips:
+            load = 0
+            mass = 0
+            departure_hours = truck_hours
+            for stop in trip:
+                load += stop.size()
+                mass += stop.mass
+                if "Truck" in stop.constraints.keys() and stop.constraints["Truck"] != truck_number:
+                    return None
+                departure_hours = max(departure_hours, self.hours_of(stop)[0])
+            if load > self.capacity or (self.mass_capacity is not None and mass > self.mass_capacity):
+                return None
+
+            location = self.hub
+            truck_hours = departure_hours
+            for stop in trip:
+                truck_hours += self.travel_times.hours(location, stop.location_name, truck_hours)
+                total_miles += self.location_graph.miles_between(location, stop.location_name)
+                if truck_hours > self.hours_of(stop)[1] - deadline_margin_hours:
+                    return None
+                location = stop.location_name
+
+            truck_hours += self.travel_times.hours(location, self.hub, truck_hours)
+            total_miles += self.location_graph.miles_between(location, self.hub)
+
+        return total_miles
+
+    # Time: O(N) Space: O(1)
+    def plan_miles(self, day_plan):
+        total_miles = 0.0
+        for truck_number, trips in day_plan.items():
+            miles = self.truck_miles(truck_number, trips)
+            if miles is None:
+                return None
+            total_miles += miles
+        return total_miles
+
+    @staticmethod
+    def copy_plan(day_plan):
+        return {truck_number: [trip.copy() for trip in trips] for truck_number, trips in day_plan.items()}
+
+    # Time: O(N) Space: O(N)
+    # Removes a few units from the plan and returns them. Half of the time the units are picked at random, otherwise a
+    # random unit is picked along with the units closest to it so nearby stops can be swapped between trips.
+    def ruin(self, day_plan, units):
+        ruin_size = self.random.randint(1, min(max_ruin_size, len(units)))
+        if self.random.random() < 0.5:
+            removed_units = self.random.sample(units, ruin_size)
+        else:
+            seed_unit = self.random.choice(units)
+            seed_location = seed_unit.stops[0].location_name
+            removed_units = sorted(units, key=lambda unit: self.location_graph.miles_between(
+                seed_location, unit.stops[0].location_name))[:ruin_size]
+
+        removed_stops = set(stop for unit in removed_units for stop in unit.stops)
+        for truck_number in day_plan.keys():
+            trips = [[stop for stop in trip if stop not in removed_stops] for trip in day_plan[truck_number]]
+            day_plan[truck_number] = [trip for trip in trips if trip]
+
+        return removed_units
+
+    # Time: O(T * N^2) Space: O(N)
+    # Inserts the unit into the trip of the truck that adds the fewest miles. Every trip of every truck is tried along
+    # with a new trip at the end of each truck's day. The stops of a unit always share a trip. Returns False if the unit
+    # cannot be placed anywhere without breaking a constraint.
+    def recreate_unit(self, day_plan, unit):
+        best_trips = None
+        best_truck = None
+        best_added_miles = None
+
+        for truck_number, trips in day_plan.items():
+            if unit.truck is not None and unit.truck != truck_number:
+                continue
+            # Time of day speeds mean removing stops can make a truck reach a later stop after its deadline, since
+            # leaving earlier may mean driving at a slower speed. Such a truck is left for the final plan check.
+            base_miles = self.truck_miles(truck_number, trips)
+            if base_miles is None:
+                continue
+
+            for trip_index in range(len(trips) + 1):
+                trial_trips = [trip.copy() for trip in trips]
+                if trip_index == len(trips):
+                    trial_trips.append([])
+
+                # Stops of the unit are placed one at a time at their cheapest feasible position in the trip.
+                trial_miles = base_miles
+                for stop in unit.stops:
+                    trip = trial_trips[trip_index]
+                    cheapest_miles = None
+                    cheapest_position = None
+                    for position in range(len(trip) + 1):
+                        trip.insert(position, stop)
+                        miles = self.truck_miles(truck_number, trial_trips)
+                        trip.pop(position)
+                        if miles is not None and (cheapest_miles is None or miles < cheapest_miles):
+                            cheapest_miles = miles
+                            cheapest_position = position
+                    if cheapest_position is None:
+                        trial_miles = None
+                        break
+                    trip.insert(cheapest_position, stop)
+                    trial_miles = cheapest_miles
+
+                if trial_miles is None:
+                    continue
+                added_miles = trial_miles - base_miles
+                if best_added_miles is None or added_miles < best_added_miles:
+                    best_added_miles = added_miles
+                    best_trips = trial_trips
+                    best_truck = truck_number
+
+        if best_trips is None:
+            return False
+
+        day_plan[best_truck] = best_trips
+        return True
+
+    # Time: O(B) Space: O(N)
+    # Improves the day plan until budget_ms milliseconds have passed and returns the best plan found. The returned plan
+    # is never worse than the plan given.
+    def improve(self, day_plan, budget_ms):
+        give_up_time = timer.perf_counter() + budget_ms / 1000
+        started = timer.perf_counter()
+
+        all_stops = [stop for trips in day_plan.values() for trip in trips for stop in trip]
+        units = RegretInsertionBuilder(self.location_graph, self.travel_times).build_units([all_stops])
+
+        current_plan = self.copy_plan(day_plan)
+        current_miles = self.plan_miles(current_plan)
+        if current_miles is None or not units:
+            return day_plan
+        best_plan = self.copy_plan(current_plan)
+        best_miles = current_miles
+        starting_temperature = starting_temperature_ratio * current_miles
+
+        while timer.perf_counter() < give_up_time:
+            candidate_plan = self.copy_plan(current_plan)
+            removed_units = self.ruin(candidate_plan, units)
+
+            # Units that are harder to place go first, which are the ones with the earliest deadline.
+            removed_units.sort(key=lambda unit: min(self.hours_of(stop)[1] for stop in unit.stops))
+            if not all(self.recreate_unit(candidate_plan, unit) for unit in removed_units):
+                continue
+
+            candidate_miles = self.plan_miles(candidate_plan)
+            if candidate_miles is None:
+                continue
+
+            progress = (timer.perf_counter() - started) / (budget_ms / 1000)
+            temperature = starting_temperature * max(0.0, 1 - progress)
+            accept_worse = temperature > 0 and \
+                self.random.random() < math.exp((current_miles - candidate_miles) / temperature)
+            if candidate_miles < current_miles or accept_worse:
+                current_plan = candidate_plan
+                current_miles = candidate_miles
+
+                if current_miles < best_miles - 1e-9:
+                    best_plan = self.copy_plan(current_plan)
+                    best_miles = current_miles
+
+        return best_plan
@@ -0,0 +1,320 @@
+from builtins import set, list
+
+from PlanImprover import PlanImprover
+from RouteSolver import HeldKarpSolver
+from Stop import build_stops, merge_stops, resolved_address
+from TravelTimes import TravelTimeTable
+from TripBuilder import RegretInsertionBuilder
+from Truck import Truck
+
+
+class HubPlanner:
+
+    # The hub planner plans the deliveries of the packages assigned to one hub with the trucks based there. Hubs are
+    # planned on their own, which keeps every plan small and lets the hubs be planned in parallel. Driving times come
+    # from the travel time table, which uses the constant travel speed when none is given.
+    def __init__(self, location_graph, hub, truck_numbers, improve_ms=0, travel_times=None):
+        self.location_graph = location_graph
+        self.hub = hub
+        self.truck_numbers = truck_numbers
+        self.improve_ms = improve_ms
+        self.travel_times = travel_times if travel_times is not None else TravelTimeTable(location_graph,
+                                                                                          Truck(1).time)
+        self.route_solver = HeldKarpSolver(location_graph)
+        self.trip_builder = RegretInsertionBuilder(location_graph, self.travel_times)
+
+    # Time: O(N^2) Space: O(N^2)
+    # This function will plan the order of operations for the package tiers, which are the package lists of the
+    # priority list, and return them as action objects sorted by time so that the scheduler can execute them. When an
+    # improvement budget is set the day plan is improved before the actions are created.
+    def plan(self, package_tiers):
+        day_plan = self.build_day_plan(package_tiers)
+
+        if self.improve_ms > 0:
+            improver = PlanImprover(self.location_graph, self.travel_times, hub=self.hub)
+            day_plan = improver.improve(day_plan, self.improve_ms)
+
+        return sorted(self.day_plan_actions(day_plan), key=lambda action: action.time)
+
+    # Time: O(N^2) Space: O(N^2)
+    # This function will build the day plan, which maps each truck number to the trips it drives in order. Every trip is
+    # a list of stops in visiting order. Packages are grouped into stops so the planning cost depends on the number of
+    # unique destinations instead of the number of packages.
+    def build_day_plan(self, package_tiers):
+
+        virtual_trucks = [Truck(truck_number, self.hub) for truck_number in self.truck_numbers]
+        day_plan = {truck.number: [] for truck in virtual_trucks}
+
+        stop_priority_list = [build_stops(package_list, self.location_graph) for package_list in package_tiers]
+
+        # Time: O(N^2) Space: O(N^2)
+        # The planning function will run until all stops have been processed and a delivery has been planned for them.
+        # idle_trucks holds the numbers of the trucks that could not load anything since the last trip was planned.
+        idle_trucks = set(list())
+        while any(stop_priority_list):
+
+            # The truck that is back at the hub first is loaded next. Idle trucks are skipped so every other truck gets
+            # to try the remaining stops, which may only fit on that truck.
+            loading_truck = min((truck for truck in virtual_trucks if truck.number not in idle_trucks),
+                                key=lambda truck: (truck.time, truck.trips))
+            loading_truck.trips += 1
+
+            loading_truck_starting_time = loading_truck.time
+            loading_truck_starting_location = loading_truck.last_location
+
+            # Fill the truck from the Delayed and Deadlined priority first, then the Delivered With and Deadlined
+            # priority, and finally the EOD priority. Stops are inserted where they add the fewest miles while every
+            # deadline on the trip can still be met.
+            trip_stops = self.trip_builder.build(loading_truck, stop_priority_list)
+
+            loading_truck.time = loading_truck_starting_time if not loading_truck.on_hold \
+                else loading_truck.holding_until
+            loading_truck.last_location = loading_truck_starting_location
+
+            # If nothing could be loaded then the remaining stops are still waiting at the airport, on an address
+            # correction, or on another truck. The truck waits at the hub until the next stop becomes available. Once
+            # every truck has tried and none can load anything, the remaining stops can no longer make their deadlines.
+            # Their deadlines are cleared and the stops are delivered late instead of never. The planning stops once
+            # nothing is left to clear.
+            if not trip_stops:
+                waiting_times = [stop.constraints["Delayed"] for stop_list in stop_priority_list for stop in stop_list
+                                 if "Delayed" in stop.constraints.keys()
+                                 and stop.constraints["Delayed"] > loading_truck.loading_time]
+                if waiting_times:
+                    loading_truck.time = min(waiting_times)
+                    loading_truck.loading_time = loading_truck.time
+                else:
+                    idle_trucks.add(loading_truck.number)
+                    if len(idle_trucks) == len(virtual_trucks):
+                        if not clear_deadlines(stop_priority_list):
+                            break
+                        idle_trucks.clear()
+                continue
+            idle_trucks.clear()
+
+            # Every package on the truck is now available so stops at the same location can be merged and the trip
+            # reordered for the fewest miles.
+            trip_stops = self.trip_order(loading_truck, trip_stops)
+
+            # The trip is driven on the virtual truck so the next trip knows when this truck is back at the hub.
+            self.prep_trip_actions(loading_truck, trip_stops)
+            day_plan[loading_truck.number].append(trip_stops)
+
+            loading_truck.reloading()
+
+        return day_plan
+
+    # Time: O(N) Space: O(N)
+    # This function creates the actions for every trip of the day plan. Each trip leaves the hub once its truck is back
+    # and every package on it has arrived.
+    def day_plan_actions(self, day_plan):
+        actions = []
+        for truck_number, trips in day_plan.items():
+            truck = Truck(truck_number, self.hub)
+            for trip_stops in trips:
+                release_times = [stop.constraints["Delayed"] for stop in trip_stops
+                                 if "Delayed" in stop.constraints.keys()]
+                if release_times and max(release_times) > truck.time:
+                    truck.hold_until(max(release_times))
+
+                # Each package is processed and actions are created for them.
+                for stop in trip_stops:
+                    for package in stop.packages:
+
+                        # Adds a status update action for the delayed packages that are not delayed due to a wrong
+                        # address.
+                        if "Delayed" in package.constraints.keys():
+                            if "Wrong" not in package.constraints.keys():
+                                actions.append(Action("DelayStatus", package.constraints["Delayed"],
+                                                      (truck.number, package.package_id,
+                                                       "Delayed on flight.", "At HUB")))
+
+                        # Adds a status update action for delayed packages due to a wrong address.
+                        if "Wrong" in package.constraints.keys():
+                            fixed_address = package.constraints["Wrong"].split(',')
+                            old_address = [package.address, package.city, package.state, package.package_zip]
+                            actions.append(Action("FixedAddress", package.constraints["Delayed"],
+                                                  (truck.number, package.package_id, fixed_address, old_address)))
+
+                        # Creates a Load Truck action for the package.
+                        actions.append(Action("LoadTruck", truck.loading_time, (truck.number, package.package_id)))
+
+                trip_stops = self.trip_order(truck, trip_stops)
+                actions += self.prep_trip_actions(truck, trip_stops)
+                truck.reloading()
+
+        return actions
+
+    # Time: O(2^N * N^2) Space: O(2^N * N)
+    # Returns the loaded stops in the order the truck drives them. Stops at the same location are merged and reordered
+    # for the fewest miles when the exact solver can handle it. Otherwise the merged stops are kept if every deadline is
+    # still met, since with time of day speeds merging can move a stop into a slower time bucket. If not, the order
+    # given is kept since it has already been checked against every deadline.
+    def trip_order(self, truck: Truck, trip_stops):
+        merged_stops = merge_stops(trip_stops)
+        exact_order = self.exact_trip_order(truck, merged_stops)
+        if exact_order is not None:
+            return exact_order
+        if self.trip_on_time(truck, merged_stops):
+            return merged_stops
+        return trip_stops
+
+    # Time: O(N) Space: O(1)
+    # Returns whether the truck reaches every stop before its deadline when it drives them in the order given.
+    def trip_on_time(self, truck: Truck, stops):
+        truck_time = truck.time
+        location = truck.last_location
+        for stop in stops:
+            truck_time = self.travel_times.arrival_time(location, stop.location_name, truck_time)
+            if stop.constraints["Deadline"] is not None and truck_time > stop.constraints["Deadline"]:
+                return False
+            location = stop.location_name
+        return True
+
+    # Time: O(2^N * N^2) Space: O(2^N * N)
+    # This function will return the stops in the order found by the exact Held-Karp solver. Each stop must be reached
+    # before its deadline. The solver works in miles, so the deadlines are turned into mileage budgets at the slowest
+    # speed of the travel time table, which keeps every order it finds on time. Returns None if the solver could not
+    # produce an order. A trip carrying a stop that is released after the truck leaves, whether it is on a late flight
+    # or waiting on an address correction, is never reordered.
+    def exact_trip_order(self, truck: Truck, stops):
+        if any(stop.constraints.get("Delayed", truck.time) > truck.time for stop in stops):
+            return None
+
+        destinations = [stop.location_name for stop in stops]
+        mileage_budgets = []
+        for stop in stops:
+            deadline = stop.constraints["Deadline"]
+            if deadline is None:
+                mileage_budgets.append(float("inf"))
+            else:
+                mileage_budgets.append((deadline - truck.time).total_seconds() / 3600 *
+                                       self.travel_times.slowest_mph)
+
+        order = self.route_solver.solve(truck.last_location, destinations, mileage_budgets)
+        if order is None:
+            return None
+
+        return [stops[index] for index in order]
+
+    # Time: O(N) Space: O(N)
+    # Finally we create actions that will be used by the execute plan function in the optimized order. The truck drives
+    # to each stop once and every package in the stop is delivered on arrival.
+    def prep_trip_actions(self, truck: Truck, stops) -> list:
+        trip_actions = []
+        for stop in stops:
+            # Calculate stop delivery mileage for the provided order
+            path_to_stop = self.location_graph.distance_between(truck.last_location, stop.location_name)
+            miles_traveled = path_to_stop[-1][1]
+            arrival_time = self.travel_times.arrival_time(truck.last_location, stop.location_name, truck.time)
+
+            # The mileage is only recorded on the first package of the stop since the rest are dropped off at the same
+            # time.
+            for package in stop.packages:
+                trip_actions.append(Action("DeliverPackage", truck.time, (truck.number, package.package_id,
+                                                                          path_to_stop[0],
+                                                                          path_to_stop[-1][0])))
+
+                trip_actions.append(
+                    Action("DeliveredPackage", arrival_time, (truck.number, miles_traveled, package.package_id)))
+                miles_traveled = 0
+
+            truck.time = arrival_time
+            truck.last_location = path_to_stop[-1][0]
+            truck.add_miles(path_to_stop[-1][1])
+
+        # Calculate return trip
+        path_to_hub = self.location_graph.distance_between(truck.last_location, truck.hub)
+        miles_traveled = path_to_hub[-1][1]
+
+        trip_actions.append(Action("Returning", truck.time, (truck.number, miles_traveled,
+                                                             truck.last_location,
+                                                             truck.hub)))
+
+        truck.time = self.travel_times.arrival_time(truck.last_location, truck.hub, truck.time)
+        truck.last_location = truck.hub
+        truck.add_miles(miles_traveled)
+
+        return trip_actions
+
+
+# Time: O(N) Space: O(1)
+# Clears the deadline of every remaining stop so the trip builder can place it. Returns whether any deadline was set.
+def clear_deadlines(stop_priority_list):
+    cleared = False
+    for stop_list in stop_priority_list:
+        for stop in stop_list:
+            if stop.constraints["Deadline"] is not None:
+                stop.constraints["Deadline"] = None
+                cleared = True
+    return cleared
+
+
+# Time: O(N^2) Space: O(N^2)
+# Plans the deliveries of one hub and returns its actions. This is a module function so it can be sent to a worker
+# process.
+def plan_hub(location_graph, hub, truck_numbers, package_tiers, improve_ms=0, travel_times=None):
+    return HubPlanner(location_graph, hub, truck_numbers, improve_ms, travel_times).plan(package_tiers)
+
+
+# Time: O(N * H) Space: O(N)
+# Assigns every package to the hub that delivers it and returns a dictionary from hub to its packages. Packages that
+# must be delivered together stay together. A group goes to the hub of its truck restriction if it has one, otherwise
+# to the hub with the fewest direct miles to the group's destinations. A group with a destination its hub cannot reach
+# on the road network, or an address that is not on it at all, is left out since it can never be delivered. The
+# scheduler reports those packages as not planned.
+def assign_hubs(packages, location_graph):
+    hubs = [hub for hub, truck_numbers in location_graph.hubs.items() if truck_numbers]
+    hub_packages = {hub: [] for hub in hubs}
+
+    package_by_id = {package.package_id: package for package in packages}
+    assigned_ids = set(list())
+    for package in packages:
+        if package.package_id in assigned_ids:
+            continue
+
+        # Collect the group of packages bound to this one by Delivered_With constraints.
+        group = []
+        pending = [package]
+        assigned_ids.add(package.package_id)
+        while pending:
+            group_package = pending.pop()
+            group.append(group_package)
+            for package_id in group_package.constraints.get("Delivered_With", []):
+                if package_id in package_by_id and package_id not in assigned_ids:
+                    assigned_ids.add(package_id)
+                    pending.append(package_by_id[package_id])
+
+        locations = [location_graph.location_name_from_address(resolved_address(group_package))
+                     for group_package in group]
+        restricted_trucks = [group_package.constraints["Truck"] for group_package in group
+                             if "Truck" in group_package.constraints.keys()]
+        group_hub = location_graph.hub_of_truck(restricted_trucks[0]) if restricted_trucks else None
+        if group_hub is None:
+
+            def group_miles(hub):
+                miles = [location_graph.miles_between(hub, location) for location in locations if location is not None]
+                return sum(float("inf") if leg_miles is None else leg_miles for leg_miles in miles)
+
+            group_hub = min(hubs, key=group_miles)
+
+        if group_hub in hub_packages and reachable(location_graph, group_hub, locations):
+            hub_packages[group_hub] += group
+
+    return hub_packages
+
+
+# Time: O(L) Space: O(1)
+# Returns whether a truck from the hub can reach every location and come back. A location of None is an address that is
+# not on the road network.
+def reachable(location_graph, hub, locations):
+    return all(location is not None and location_graph.miles_between(hub, location) is not None
+               for location in locations)
+
+
+class Action:
+
+    def __init__(self, action_type, time, value):
+        self.action_type = action_type
+        self.time = time
+        self.value = value
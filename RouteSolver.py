@@ -0,0 +1,107 @@
+import time as timer
+
+# Trips with more unique destinations than this fall back to the nearest neighbor ordering. A truck only carries 16
+# packages so most trips end up under this limit once packages going to the same address are merged.
+exact_stop_limit = 13
+# Maximum number of seconds the exact solver may run before it gives up and the heuristic order is used instead.
+exact_time_cap_seconds = 1.0
+
+
+class HeldKarpSolver:
+
+    def __init__(self, location_graph, stop_limit=exact_stop_limit, time_cap_seconds=exact_time_cap_seconds):
+        self.location_graph = location_graph
+        self.stop_limit = stop_limit
+        self.time_cap_seconds = time_cap_seconds
+
+    # Time: O(2^N * N^2) Space: O(2^N * N)
+    # This function finds the visiting order of the destinations that results in the fewest miles for a round trip that
+    # starts and ends at the start location. Each destination may have a mileage budget, which is the number of miles
+    # the truck can drive before that destination's deadline has passed. Partial routes that arrive at a destination
+    # past its budget are thrown away as soon as they are found. Because travel time only grows with miles, the
+    # shortest partial route to a destination is also the earliest one, so throwing away late routes never removes the
+    # optimal answer. None is returned if there are too many destinations, the time cap is hit, or no order can meet
+    # every deadline. The caller is then expected to use its heuristic order.
+    def solve(self, start_location, destinations, mileage_budgets=None):
+        stop_count = len(destinations)
+        if stop_count == 0:
+            return []
+        if stop_count > self.stop_limit:
+            return None
+
+        infinity = float("inf")
+        if mileage_budgets is None:
+            mileage_budgets = [infinity] * stop_count
+
+        give_up_time = timer.perf_counter() + self.time_cap_seconds
+
+        # Build a small distance matrix between the destinations so the inner loop does not use the location graph.
+        from_start = [self.location_graph.miles_between(start_location, destination) for destination in destinations]
+        between = [[self.location_graph.miles_between(first, second) for second in destinations]
+                   for first in destinations]
+
+        full_mask = (1 << stop_count) - 1
+        cost = [None] * (full_mask + 1)
+        parent = [None] * (full_mask + 1)
+
+        for i in range(stop_count):
+            if from_start[i] <= mileage_budgets[i]:
+                cost[1 << i] = [infinity] * stop_count
+                parent[1 << i] = [-1] * stop_count
+                cost[1 << i][i] = from_start[i]
+
+        # Time: O(2^N * N^2) Space: O(2^N * N)
+        # Masks are processed in increasing order so every subset is finished before any of its supersets are used.
+        for mask in range(1, full_mask + 1):
+            mask_cost = cost[mask]
+            if mask_cost is None:
+                continue
+            if timer.perf_counter() > give_up_time:
+                return None
+
+            for last in range(stop_count):
+                last_cost = mask_cost[last]
+                if last_cost == infinity:
+                    continue
+                last_row = between[last]
+                for following in range(stop_count):
+                    if mask & (1 << following):
+                        continue
+                    new_cost = last_cost + last_row[following]
+                    if new_cost > mileage_budgets[following]:
+                        continue
+                    new_mask = mask | (1 << following)
+                    if cost[new_mask] is None:
+                        cost[new_mask] = [infinity] * stop_count
+                        parent[new_mask] = [-1] * stop_count
+                    if new_cost < cost[new_mask][following]:
+                        cost[new_mask][following] = new_cost
+                        parent[new_mask][following] = last
+
+        if cost[full_mask] is None:
+            return None
+
+        # Close each complete route by returning to the start location and keep the cheapest one.
+        best_last = None
+        best_cost = infinity
+        for last in range(stop_count):
+            round_trip = cost[full_mask][last] + from_start[last]
+            if round_trip < best_cost:
+                best_cost = round_trip
+                best_last = last
+
+        if best_last is None:
+            return None
+
+        # Walk the parent pointers backwards to rebuild the visiting order.
+        order = []
+        mask = full_mask
+        last = best_last
+        while last != -1:
+            order.append(last)
+            previous = parent[mask][last]
+            mask &= ~(1 << last)
+            last = previous
+        order.reverse()
+
+        return order
@@ -1,42 +1,134 @@
-import operator
-from builtins import set, list
 import copy
-from datetime import datetime, timedelta
+import hashlib
+import os
+from builtins import set, list
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
 
+from PlanBounds import infeasible_packages, mileage_lower_bound
+from Planner import Action, assign_hubs, plan_hub
+from TravelTimes import TravelTimeTable
 from Truck import Truck
 
 initial_time = "8:00 AM"
-travel_speed_mph = 18
 
 
 class Scheduler:
-    # Scheduler needs to keep track of the current tie and the previous time for the plan execution operations.
-    current_time = None
-    previous_time = None
-
-    package_manager = None
-    location_graph = None
-
-    # The scheduled_plan_queue is a FIFO queue. It will also operation as a stack after initialization and being used
-    # by the execution operations.
-    scheduled_plan_queue = []
-    executed_stack = []
-
-    truck1 = Truck(1)
-    truck2 = Truck(2)
 
     # Time: O(N^2) Space: O(N^2)
-    def __init__(self, pack_man, location_graph, time=initial_time):
+    # A plan cache can be provided so an unchanged set of input files and parameters reuses the plan stored on disk.
+    # Setting bypass_cache forces a new plan, which then replaces the cached one. improve_ms is the number of
+    # milliseconds spent improving the plan after it is built. Every action applied or undone is written to the event
+    # log when one is provided. travel_times is the travel time table the trucks drive by, which uses the constant
+    # travel speed when none is given.
+    def __init__(self, pack_man, location_graph, time=initial_time, plan_cache=None, bypass_cache=False,
+                 improve_ms=0, event_log=None, travel_times=None):
+        self.improve_ms = improve_ms
+        self.event_log = event_log
+        self.travel_times = travel_times if travel_times is not None else TravelTimeTable(location_graph,
+                                                                                          Truck(1).time)
+        # Scheduler needs to keep track of the current time and the previous time for the plan execution operations.
         self.current_time = datetime.strptime(time, "%I:%M %p")
         self.previous_time = self.current_time
         self.package_manager = pack_man
         self.location_graph = location_graph
 
+        # The plan actions are sorted by time and never changed once planned, so forks of the scheduler share them.
+        # next_action splits them into the executed actions before it and the scheduled actions from it onwards.
+        self.plan_actions = ()
+        self.next_action = 0
+
+        # Every hub has its own fleet. trucks maps each truck number to its truck.
+        self.trucks = {truck_number: Truck(truck_number, hub)
+                       for hub, truck_numbers in location_graph.hubs.items() for truck_number in truck_numbers}
+
+        # Packages that will be late in any plan are found before planning, along with a lower bound on the fleet miles
+        # that the planned miles can be compared against.
+        all_packages = pack_man.packages.get_package_list()
+        self.infeasible_packages = infeasible_packages(all_packages, location_graph, self.travel_times, Truck(1).time)
+        self.mileage_lower_bound = mileage_lower_bound(all_packages, location_graph)
+
         # The scheduler object initializes and plans the package delivery order. It then runs the execute plan
         # operation to bring the application to the initialized time.
-        self.plan()
+        self.cached_plan(plan_cache, bypass_cache)
         self.execute_plan()
 
+    # Time: O(N^2) Space: O(N^2)
+    # Loads the scheduled actions from the plan cache when possible. Otherwise the plan is created and stored in the
+    # cache for the next run.
+    def cached_plan(self, plan_cache, bypass_cache):
+        if plan_cache is None:
+            self.plan()
+            return
+
+        input_file_names = [self.package_manager.file_name, self.location_graph.file_name]
+        if os.path.exists(self.package_manager.corrections_file_name):
+            input_file_names.append(self.package_manager.corrections_file_name)
+        plan_key = plan_cache.plan_key(input_file_names,
+                                       [initial_time, self.travel_times.bucket_minutes, self.travel_times.bucket_speeds,
+                                        self.travel_times.zone_speeds, Truck.capacity, Truck.mass_capacity,
+                                        self.improve_ms, sorted(self.location_graph.hubs.items())])
+
+        cached_actions = None if bypass_cache else plan_cache.load(plan_key)
+        if cached_actions is not None:
+            self.plan_actions = tuple(cached_actions)
+            return
+
+        self.plan()
+        plan_cache.store(plan_key, self.plan_actions)
+
+    # Time: O(N) Space: O(1)
+    # Returns the miles the trucks drive over the whole day with the current plan.
+    def planned_miles(self):
+        return sum(action.value[1] for action in self.plan_actions
+                   if action.action_type in ("DeliveredPackage", "Returning"))
+
+    # Time: O(N) Space: O(1)
+    # Returns a hash of the plan actions. An event log records it so the log is only replayed against the plan it was
+    # written for.
+    def plan_digest(self):
+        digest = hashlib.sha256()
+        for action in self.plan_actions:
+            digest.update(repr(action_key(action)).encode("UTF-8"))
+        return digest.hexdigest()
+
+    # Time: O(N) Space: O(N)
+    # Returns the packages the plan delivers after their deadline paired with the planned delivery time, along with the
+    # packages the plan never delivers paired with None.
+    def late_packages(self):
+        delivery_times = {action.value[2]: action.time for action in self.plan_actions
+                          if action.action_type == "DeliveredPackage"}
+        late_packages = []
+        for package in self.package_manager.packages.get_package_list():
+            delivery_time = delivery_times.get(package.package_id)
+            deadline = package.constraints["Deadline"]
+            if delivery_time is None or (deadline is not None and delivery_time > deadline):
+                late_packages.append((package, delivery_time))
+        return late_packages
+
+    # Time: O(N^2) Space: O(N^2)
+    # This function will plan the order of operations and store them as action objects in the plan actions so that the
+    # execution plan function can operation on them. Packages are assigned to hubs and every hub is planned on its own.
+    # With more than one hub the hubs are planned in parallel worker processes and their actions merged into one
+    # timeline.
+    def plan(self):
+        hub_packages = assign_hubs(self.package_manager.packages.get_package_list(), self.location_graph)
+        hub_jobs = [(hub, self.location_graph.hubs[hub], self.package_manager.priority_list(packages))
+                    for hub, packages in hub_packages.items() if packages]
+
+        if len(hub_jobs) <= 1:
+            hub_actions = [plan_hub(self.location_graph, hub, truck_numbers, package_tiers, self.improve_ms,
+                                    self.travel_times)
+                           for hub, truck_numbers, package_tiers in hub_jobs]
+        else:
+            with ProcessPoolExecutor(max_workers=min(len(hub_jobs), os.cpu_count() or 1)) as executor:
+                hub_actions = list(executor.map(plan_hub, [self.location_graph] * len(hub_jobs),
+                                                *zip(*hub_jobs), [self.improve_ms] * len(hub_jobs),
+                                                [self.travel_times] * len(hub_jobs)))
+
+        self.plan_actions = tuple(sorted((action for actions in hub_actions for action in actions),
+                                         key=lambda action: action.time))
+
     # Every time the time changes the previous time needs to be recorded and the the execution of the plan need to be
     # ran.
     def change_time(self, new_time):
@@ -44,488 +136,188 @@ class Scheduler:
         self.current_time = new_time
         self.execute_plan()
 
-    # Time: O(N^2) Space: O(N^2)
-    # This function will plan the order of operations and store them as action objects in the scheduled plan queue so
-    # that the execution plan function can operation on them.
-    def plan(self):
-
-        # This inner function will take a list of packages and return the path to the package closest to the
-        # starting_location.
-        def nearest_neighbor(starting_location, list_of_packages):
-            lowest_mileage_seen = 1000
-            best_choice = None
-
-            for pack in list_of_packages:
-                path_to_pack = self.location_graph.distance_between(starting_location,
-                                                                    self.location_graph.location_name_from_address(
-                                                                        pack.address))
-                if path_to_pack[1][1] < lowest_mileage_seen:
-                    lowest_mileage_seen = path_to_pack[1][1]
-                    best_choice = pack
-
-            return best_choice
-
-        # This inner function is used by the optimized_trip function to check if the selected package loaded into the
-        # selected truck will result in a valid delivery condition.
-        def constraints_valid(truck, pack, copy_of_packages):
-            result = True
-            truck_copy = copy.deepcopy(truck)
-            wrong_package_correction = None
-
-            if "Delayed" in pack.constraints.keys() and pack.constraints["Deadline"]:
-                if not truck.on_hold:
-                    truck.hold_until(pack.constraints["Delayed"])
-
-            elif "Delayed" in pack.constraints.keys() and "Wrong" not in pack.constraints.keys():
-                if pack.constraints["Delayed"] > truck.loading_time:
-                    result = False
-
-            elif "Wrong" in pack.constraints.keys():
-                fixed_wrong_address = pack.constraints["Wrong"].split(',')
-                wrong_package_correction = copy.deepcopy(pack)
-                wrong_package_correction.address = fixed_wrong_address[0].strip().strip('.')
-                wrong_package_correction.city = fixed_wrong_address[1].strip()
-                wrong_package_correction.state = fixed_wrong_address[2].strip().partition(' ')[0]
-                wrong_package_correction.package_zip = fixed_wrong_address[2].strip().partition(' ')[2]
-                pack = wrong_package_correction
-
-            elif "Delivered_With" in pack.constraints.keys():
-                count = 1
-                for pack_id in pack.constraints["Delivered_With"]:
-                    if truck.package_onboard(pack_id):
-                        continue
-                    elif pack_id in map(operator.attrgetter("package_id"), copy_of_packages):
-                        count += 1
-
-                if len(truck.packages) + count > 16:
-                    result = False
-
-            # If the package must be delivered on truck 2 then this operation will place it on truck 2 if it has
-            # space. If there is no room then the package loading is skipped until the next loading phase.
-            if "Truck" in pack.constraints.keys():
-                if pack.constraints["Truck"] == 2:
-                    if truck.number != 2:
-                        result = False
-
-            # So far if the result is still true then we can calculate the time and if there is a deadline associated
-            # with the package then we would test it here.
-            if result:
-                path_to_pack = self.location_graph.distance_between(truck.last_location,
-                                                                    self.location_graph.location_name_from_address(
-                                                                        pack.address))
-
-                miles_traveled = path_to_pack[1][1]
-
-                truck.time = truck.time + timedelta(hours=(miles_traveled / travel_speed_mph))
-
-                truck.last_location = path_to_pack[1][0]
-
-                if pack.constraints["Deadline"]:
-
-                    # If the package will be delivered late then set result to false.
-                    if truck.time > pack.constraints["Deadline"]:
-                        result = False
-                    else:
-                        return True
-
-                else:
-                    return True
-
-            # If the result is false at this point then the truck needs to be reset to before it was handled by this
-            # function.
-            if not result:
-                truck.on_hold = truck_copy.on_hold
-                truck.time = truck_copy.time
-                truck.loading_time = truck_copy.loading_time
-                truck.holding_until = truck_copy.holding_until
-                truck.last_location = truck_copy.last_location
-
-                return False
-
-        # This inner function will take a truck and a list of packages and load the truck with all the packages that
-        # result in a valid delivery condition from the provided list of packages.
-        def optimized_trip(truck, package_list):
-            # A copy is made of the list so the iteration and modification of the lists are independent.
-            copy_of_packages = package_list.copy()
-            skipped_addresses = set(list())
-            # A copy of the truck is needed so that the truck can be reset to its last good configuration easily.
-            truck_copy = copy.deepcopy(truck)
-            packages_loaded = []
-            while copy_of_packages:
-                if truck.has_space():
-                    pack = nearest_neighbor(truck.last_location, copy_of_packages)
-                    if pack.address not in skipped_addresses and constraints_valid(truck, pack, copy_of_packages):
-                        truck.load_package(pack)
-                        truck.last_location = self.location_graph.location_name_from_address(pack.address)
-                        copy_of_packages.remove(pack)
-                        package_list.remove(pack)
-                        packages_loaded.append(pack)
-
-                    # Hard abort this package list and reset truck to before calculating the Delivered_With packages.
-                    elif "Delivered_With" in pack.constraints.keys():
-                        copy_of_packages.remove(pack)
-                        skipped_addresses.add(pack.address)
-
-                        for pack_id in pack.constraints["Delivered_With"]:
-                            pack_bound = self.package_manager.packages.get_package(pack_id)
-                            if truck.package_onboard(pack_id):
-                                truck.unload_package_id(pack_id)
-                                package_list.append(pack_bound)
-                            if pack_bound in copy_of_packages:
-                                copy_of_packages.remove(pack_bound)
-                        skipped_addresses.add(pack.address)
-                        time = truck_copy.time
-                        location = truck_copy.last_location
-                        for packs in packages_loaded:
-                            path = self.location_graph.distance_between(location,
-                                                                        self.location_graph.location_name_from_address(
-                                                                            packs.address))
-
-                            miles_traveled = path[1][1]
-
-                            time = time + timedelta(hours=(miles_traveled / travel_speed_mph))
-
-                            location = path[1][0]
-
-                        truck.last_location = location
-                        truck.time = time
-
-                    else:
-                        copy_of_packages.remove(pack)
-                        skipped_addresses.add(pack.address)
-
-                        for loaded_pack in packages_loaded:
-                            if pack.address == loaded_pack.address:
-                                packages_loaded.remove(loaded_pack)
-                                truck.unload_package(loaded_pack)
-                                package_list.append(loaded_pack)
-                else:
-                    break
-
-        virtual_truck1 = Truck(1)
-        virtual_truck2 = Truck(2)
-
-        package_priority_list = self.package_manager.priority_list()
-
-        # Time: O(N^2) Space: O(N^2)
-        # The planning function will run until all packages have been processed and a delivery has been planned for
-        # them.
-        loading_list = []
-        while package_priority_list[0] or package_priority_list[1] or package_priority_list[2]:
-
-            loading_truck = virtual_truck1 if virtual_truck1.trips <= virtual_truck2.trips else virtual_truck2
-            loading_truck.trips += 1
-
-            loading_truck_starting_time = loading_truck.time
-            loading_truck_starting_location = loading_truck.last_location
-
-            # Select the most optimal packages from the Delayed and Deadlined priority to load into a truck.
-            optimized_trip(loading_truck, package_priority_list[0])
-
-            # Select the most optimal packages from the Delivered With and Deadlined priority to load into a truck.
-            optimized_trip(loading_truck, package_priority_list[1])
-
-            # Select the most optimal packages from the EOD priority to load into a truck.
-            optimized_trip(loading_truck, package_priority_list[2])
-
-            loading_truck.time = loading_truck_starting_time if not loading_truck.on_hold \
-                else loading_truck.holding_until
-            loading_truck.last_location = loading_truck_starting_location
-
-            # The original package priority list will be updated as packages are pulled from it so a copy is made to
-            # prevent skips in the package iteration process.
-            packages_on_truck_iterator = loading_truck.packages.copy()
-
-            # Each package is processed and actions are created for them.
-            for package in packages_on_truck_iterator:
-
-                # Adds a status update action for the delayed packages that are not delayed due to a wrong address.
-                if "Delayed" in package.constraints.keys():
-                    if "Wrong" not in package.constraints.keys():
-                        loading_list.append(Action("DelayStatus", package.constraints["Delayed"],
-                                                   (loading_truck.number, package.package_id,
-                                                    "Delayed on flight.", "At HUB")))
-
-                # Adds a status update action for delayed packages due to a wrong address.
-                if "Wrong" in package.constraints.keys():
-                    fixed_address = package.constraints["Wrong"].split(',')
-                    old_address = [package.address, package.city, package.state, package.package_zip]
-                    fixed_address_action = Action("FixedAddress", package.constraints["Delayed"],
-                                                  (loading_truck.number, package.package_id,
-                                                   fixed_address, old_address))
-                    loading_list.append(fixed_address_action)
-
-                # Creates a Load Truck action, loads the virtual truck selected, and removes the package from the
-                # priority list.
-                loading_action = Action("LoadTruck",
-                                        loading_truck.loading_time, (loading_truck.number, package.package_id))
-                loading_list.append(loading_action)
+    # Time: O(N) Space: O(1)
+    # The execute plan will process the plan actions based on the current time.
+    def execute_plan(self):
 
-            loading_truck_trip = self.prep_trip_actions(loading_truck)
+        # This branch will run if the current time is greater than the previous time. The scheduled actions are applied
+        # in order until the current time is reached.
+        if self.current_time > self.previous_time:
+            while self.next_action < len(self.plan_actions) and \
+                    self.plan_actions[self.next_action].time <= self.current_time:
+                current_action = self.plan_actions[self.next_action]
+                apply_action(current_action, self.package_manager, self.trucks)
+                if self.event_log is not None:
+                    self.event_log.write_action(current_action, self.current_time)
+                self.next_action += 1
+
+        # Will undo the actions performed so far, newest first, and return them to the scheduled actions.
+        elif self.current_time < self.previous_time:
+            while self.next_action > 0 and self.plan_actions[self.next_action - 1].time >= self.current_time:
+                current_action = self.plan_actions[self.next_action - 1]
+                undo_action(current_action, self.package_manager, self.trucks)
+                if self.event_log is not None:
+                    self.event_log.write_action(current_action, self.current_time, undo=True)
+                self.next_action -= 1
 
-            self.scheduled_plan_queue += loading_list + loading_truck_trip
+    # Time: O(N) Space: O(1)
+    # Brings the scheduler up to date with actions that were replayed from an event log. Actions are applied in plan
+    # order, so the replayed actions match the start of the plan actions and are marked as executed. The clock is set to
+    # the time the log was written at.
+    def resume(self, replayed_actions, clock):
+        for action in replayed_actions:
+            if self.next_action == len(self.plan_actions) or \
+                    action_key(self.plan_actions[self.next_action]) != action_key(action):
+                break
+            self.next_action += 1
+
+        if clock is not None:
+            self.previous_time = clock
+            self.current_time = clock
 
-            loading_truck.reloading()
+    # Time: O(N) Space: O(N)
+    # Returns a copy of the scheduler that can be changed without changing this one, which is used to try what-if
+    # variants of the day in the same process. The location graph and the plan actions are shared since
+    # they are never changed in place. Only the trucks and the position in the plan are copied, and each package is
+    # only copied once one of the two schedulers changes it. The fork does not write to the event log.
+    def fork(self):
+        forked = copy.copy(self)
+        forked.package_manager = self.package_manager.fork()
+        forked.trucks = {truck_number: truck.copy() for truck_number, truck in self.trucks.items()}
+        forked.event_log = None
+        return forked
+
+    # Time: O(N log N) Space: O(N)
+    # Pushes every action of the truck that has not been executed yet back by the delay, which is a timedelta. Status
+    # updates of delayed packages stay where they are since they do not depend on the truck. The scheduler gets new
+    # plan actions so forks sharing the old ones are not affected.
+    def delay_truck(self, truck_number, delay):
+        remaining_actions = []
+        for action in self.plan_actions[self.next_action:]:
+            if action.value[0] == truck_number and action.action_type not in ("DelayStatus", "FixedAddress"):
+                action = Action(action.action_type, action.time + delay, action.value)
+            remaining_actions.append(action)
+        remaining_actions.sort(key=lambda action: action.time)
+        self.plan_actions = self.plan_actions[:self.next_action] + tuple(remaining_actions)
 
-        self.scheduled_plan_queue.sort(key=lambda action: action.time)
+    # Time: O(N^2) Space: O(N^2)
+    # Plans the day again from the packages the package manager holds now, for example after a package was added to a
+    # fork. Every executed action is undone first, then the new plan is executed up to the current time.
+    def replan(self):
+        while self.next_action > 0:
+            self.next_action -= 1
+            undo_action(self.plan_actions[self.next_action], self.package_manager, self.trucks)
+
+        resume_time = self.current_time
+        self.plan()
+        self.current_time = self.previous_time = datetime.strptime(initial_time, "%I:%M %p")
+        self.change_time(resume_time)
 
-    # Time: O(N) Space: O(N)
-    def optimize_trip_order(self, truck: Truck):
-
-        def nearest_neighbor(starting_location, list_of_packages):
-            lowest_mileage_seen = 1000
-            best_choice = None
-
-            for pack in list_of_packages:
-                path_to_pack = self.location_graph.distance_between(starting_location,
-                                                                    self.location_graph.location_name_from_address(
-                                                                        pack.address))
-                if path_to_pack[1][1] < lowest_mileage_seen:
-                    lowest_mileage_seen = path_to_pack[1][1]
-                    best_choice = pack
-
-            return best_choice
-
-        optimized_trip_actions = []
-        deadline_list = []
-        eod_list = []
-        visited_set = set(list())
-
-        # Time: O(N) Space: O(N)
-        # First organize each package based on 2 criteria, deadline and EOD. If a package destination has already been
-        # seen in the deadline list then add the current EOD package to the deadline list. This way both packages are
-        # delivered simultaneously.
-        for package in truck.packages:
-            if package.constraints["Deadline"]:
-                deadline_list.append(package)
-                visited_set.add(package.address)
-            else:
-                if package.address in visited_set:
-                    deadline_list.append(package)
-                else:
-                    eod_list.append(package)
-
-        front_last_location = "Western Governors University"
-        back_last_location = "Western Governors University"
-        front_optimized_order = []
-        back_optimized_order = []
-        while deadline_list or eod_list:
-            if deadline_list:
-                nearest_package = nearest_neighbor(front_last_location, deadline_list)
-                front_last_location = self.location_graph.location_name_from_address(nearest_package.address)
-                front_optimized_order.append(nearest_package)
-                deadline_list.remove(nearest_package)
-            elif eod_list:
-                nearest_package = nearest_neighbor(front_last_location, eod_list)
-                front_last_location = self.location_graph.location_name_from_address(nearest_package.address)
-                front_optimized_order.append(nearest_package)
-                eod_list.remove(nearest_package)
-
-            if eod_list:
-                nearest_package = nearest_neighbor(back_last_location, eod_list)
-                back_last_location = self.location_graph.location_name_from_address(nearest_package.address)
-                back_optimized_order.insert(0, nearest_package)
-                eod_list.remove(nearest_package)
-            elif deadline_list:
-                nearest_package = nearest_neighbor(back_last_location, deadline_list)
-                back_last_location = self.location_graph.location_name_from_address(nearest_package.address)
-                back_optimized_order.insert(0, nearest_package)
-                deadline_list.remove(nearest_package)
-
-        truck.packages = front_optimized_order + back_optimized_order
 
-    # Time: O(N) Space: O(N)
-    # Finally we create actions that will be used by the execute plan function in the optimized order.
-    def prep_trip_actions(self, truck: Truck) -> list:
-        trip_actions = []
-        for package in truck.packages:
-            # Calculate package delivery mileage for the provided order
-            path_to_package = self.location_graph.distance_between(truck.last_location,
-                                                                   self.location_graph.location_name_from_address(
-                                                                       package.address))
-            miles_traveled = path_to_package[1][1]
+# Time: O(1) Space: O(1)
+# Returns a value that identifies the action so replayed actions can be matched with the planned ones.
+def action_key(action):
+    return action.action_type, action.time, repr([list(value) if type(value) is tuple else value
+                                                  for value in action.value])
 
-            trip_actions.append(Action("DeliverPackage", truck.time, (truck.number, package.package_id,
-                                                                      path_to_package[0],
-                                                                      path_to_package[1][0])))
 
-            truck.time = truck.time + timedelta(hours=(miles_traveled / travel_speed_mph))
+# Time: O(N) Space: O(1)
+# Applies the action to the packages and trucks. trucks maps each truck number to its truck.
+def apply_action(current_action, package_manager, trucks):
+    # The truck is selected based on the current action.
+    truck = trucks[current_action.value[0]]
 
-            trip_actions.append(
-                Action("DeliveredPackage", truck.time, (truck.number, miles_traveled, package.package_id)))
+    # Will load the specified package onto the truck and update the package status message.
+    if current_action.action_type == "LoadTruck":  # (Truck Number, Package ID)
 
-            truck.last_location = path_to_package[1][0]
-            truck.add_miles(miles_traveled)
+        package = package_manager.writable_package(current_action.value[1])
+        truck.load_package(package)
 
-        # Calculate return trip
-        path_to_hub = self.location_graph.distance_between(truck.last_location,
-                                                           "Western Governors University")
-        miles_traveled = path_to_hub[1][1]
+        package_manager.update_truck(package, truck.number)
+        package_manager.update_status(package, f"In transit via Truck {truck.number}.")
 
-        trip_actions.append(Action("Returning", truck.time, (truck.number, miles_traveled,
-                                                             truck.last_location,
-                                                             "Western Governors University")))
+    # Will update the package status message of the delayed package.
+    elif current_action.action_type == "DelayStatus":  # (Truck Number, Package ID, Old Status, New Status)
+        package = package_manager.writable_package(current_action.value[1])
+        package_manager.update_status(package, current_action.value[3])
 
-        truck.time = truck.time + timedelta(hours=miles_traveled / travel_speed_mph)
-        truck.last_location = "Western Governors University"
-        truck.add_miles(miles_traveled)
+    # Will update the package that will be delivered next.
+    elif current_action.action_type == "DeliverPackage":  # (Truck Number, Package ID, Start, Destination)
 
-        return trip_actions
+        package = package_manager.writable_package(current_action.value[1])
+        package_manager.update_status(package, f"En route to Destination via Truck {truck.number}.")
 
-    # Time: O(N) Space: O(1)
-    # The execute plan will process the actions in the scheduled plan queue based on the current time.
-    def execute_plan(self):
-        # This branch will run if the current time is greater than the previous time. Actions are popped off the front
-        # of the scheduled plan queue and their values applied.
-        if self.current_time > self.previous_time:
-            try:
-                current_action = self.scheduled_plan_queue.pop(0)
-            except IndexError:
-                return
-
-            # Actions are popped off the front of the scheduled plan queue continuously until the current time is
-            # reached.
-            while current_action.time <= self.current_time:
-
-                # The truck is selected based on the current action.
-                truck = None
-                if current_action.value[0] == 1:
-                    truck = self.truck1
-                else:
-                    truck = self.truck2
-
-                # Will load the specified package onto the truck and update the package status message.
-                if current_action.action_type == "LoadTruck":  # (Truck Number, Package ID)
-
-                    package = self.package_manager.packages.get_package(current_action.value[1])
-                    truck.load_package(package)
-
-                    package.status = f"In transit via Truck {truck.number}."
-
-                # Will update the package status message of the delayed package.
-                elif current_action.action_type == "DelayStatus":  # (Truck Number, Package ID, Old Status, New Status)
-                    package = self.package_manager.packages.get_package(current_action.value[1])
-                    package.status = current_action.value[3]
-
-                # Will update the package that will be delivered next.
-                elif current_action.action_type == "DeliverPackage":  # (Truck Number, Package ID, Start, Destination)
-
-                    package = self.package_manager.packages.get_package(current_action.value[1])
-                    package.status = f"En route to Destination via Truck {truck.number}."
-
-                # Updates the package that has been delivered and unloads it from the truck.
-                elif current_action.action_type == "DeliveredPackage":  # (Truck Number, Miles, Package ID)
-
-                    package = self.package_manager.packages.get_package(current_action.value[2])
-                    package.status = "Delivered at " + str(current_action.time.time()) + " via Truck " + \
-                                     str(current_action.value[0])
-                    package.delivered = True
-                    package.delivery_time = current_action.time
-                    truck.add_miles(current_action.value[1])
-
-                    truck.unload_package_id(package.package_id)
-
-                # Makes sure to include the return trips mileage in the total.
-                elif current_action.action_type == "Returning":  # (Truck Number, Miles, Last Location, HUB)
-                    truck.add_miles(current_action.value[1])
-
-                # Fixes the address of the packages with the wrong address.
-                elif current_action.action_type == "FixedAddress":  # (Truck Number, Package ID, Fixed Address,
-                    # Old Address)
-                    package = self.package_manager.packages.get_package(current_action.value[1])
-                    package.address = current_action.value[2][0].strip()
-                    package.city = current_action.value[2][1].strip()
-                    package.state = current_action.value[2][2].strip().partition(' ')[0]
-                    package.package_zip = current_action.value[2][2].strip().partition(' ')[2]
-
-                    package.status = "Address has been fixed. Package at HUB"
-
-                # Inserts the action in the executed stack in a FILO order.
-                self.executed_stack.insert(0, current_action)
-
-                # Changes the current action to the next action if available.
-                if len(self.scheduled_plan_queue) == 0:
-                    break
-                else:
-                    current_action = self.scheduled_plan_queue.pop(0)
-
-        # Will undo the actions performed so far by popping actions from the executed stack, changing statuses, and
-        # reinserting actions into the scheduled plan queue.
-        elif self.current_time < self.previous_time:
-            try:
-                current_action = self.executed_stack.pop(0)
-            except IndexError:
-                return
+    # Updates the package that has been delivered and unloads it from the truck.
+    elif current_action.action_type == "DeliveredPackage":  # (Truck Number, Miles, Package ID)
 
-            # Will perform actions up to the current time.
-            while current_action.time >= self.current_time:
+        package = package_manager.writable_package(current_action.value[2])
+        package_manager.update_delivery(package, current_action.time)
+        package_manager.update_status(package, "Delivered at " + str(current_action.time.time()) + " via Truck " +
+                                      str(current_action.value[0]))
+        package_manager.update_truck(package, None)
+        truck.add_miles(current_action.value[1])
 
-                # Selects the appropriate truck to operate on.
-                truck = None
-                if current_action.value[0] == 1:
-                    truck = self.truck1
-                else:
-                    truck = self.truck2
+        truck.unload_package_id(package.package_id)
 
-                # Unloads the package from the truck and set its status to chow it is at the HUB.
-                if current_action.action_type == "LoadTruck":  # (Truck Number, Package ID)
+    # Makes sure to include the return trips mileage in the total.
+    elif current_action.action_type == "Returning":  # (Truck Number, Miles, Last Location, HUB)
+        truck.add_miles(current_action.value[1])
 
-                    package = self.package_manager.packages.get_package(current_action.value[1])
-                    truck.unload_package_id(package.package_id)
+    # Fixes the address of the packages with the wrong address.
+    elif current_action.action_type == "FixedAddress":  # (Truck Number, Package ID, Fixed Address, Old Address)
+        package = package_manager.writable_package(current_action.value[1])
+        package_manager.update_address(package, current_action.value[2][0].strip(), current_action.value[2][1].strip(),
+                                       current_action.value[2][2].strip().partition(' ')[0],
+                                       current_action.value[2][2].strip().partition(' ')[2])
 
-                    package.status = "At HUB"
+        package_manager.update_status(package, "Address has been fixed. Package at HUB")
 
-                # Change the status message on the package to show that it is delayed again.
-                elif current_action.action_type == "DelayStatus":  # (Truck Number, Package ID, Old Status, New Status)
-                    package = self.package_manager.packages.get_package(current_action.value[1])
-                    package.status = current_action.value[2]
 
-                # Change the package to chow that it is on a truck but not en route.
-                elif current_action.action_type == "DeliverPackage":  # (Truck Number, Package ID, Start, Destination)
+# Time: O(N) Space: O(1)
+# Reverses the action on the packages and trucks. trucks maps each truck number to its truck.
+def undo_action(current_action, package_manager, trucks):
+    # Selects the appropriate truck to operate on.
+    truck = trucks[current_action.value[0]]
 
-                    package = self.package_manager.packages.get_package(current_action.value[1])
-                    package.status = f"In transit via Truck {truck.number}."
+    # Unloads the package from the truck and set its status to chow it is at the HUB.
+    if current_action.action_type == "LoadTruck":  # (Truck Number, Package ID)
 
-                # Undeliver the package, change the status, undue the mileage added, and reload the package onto the
-                # truck.
-                elif current_action.action_type == "DeliveredPackage":  # (Truck Number, Miles, Package ID)
+        package = package_manager.writable_package(current_action.value[1])
+        truck.unload_package_id(package.package_id)
 
-                    package = self.package_manager.packages.get_package(current_action.value[2])
-                    package.status = f"En route to Destination via Truck {truck.number}."
-                    package.delivered = False
-                    package.delivery_time = None
-                    truck.add_miles(-current_action.value[1])
+        package_manager.update_truck(package, None)
+        package_manager.update_status(package, "At HUB")
 
-                    truck.load_package(package.package_id)
+    # Change the status message on the package to show that it is delayed again.
+    elif current_action.action_type == "DelayStatus":  # (Truck Number, Package ID, Old Status, New Status)
+        package = package_manager.writable_package(current_action.value[1])
+        package_manager.update_status(package, current_action.value[2])
 
-                # Undue the mileage added to the truck for the return trip.
-                elif current_action.action_type == "Returning":  # (Truck Number, Miles, Last Location, HUB)
-                    truck.add_miles(-current_action.value[1])
+    # Change the package to chow that it is on a truck but not en route.
+    elif current_action.action_type == "DeliverPackage":  # (Truck Number, Package ID, Start, Destination)
 
-                # Change the package back to the wrong address listed and change the status back.
-                elif current_action.action_type == "FixedAddress":  # (Truck Number, Package ID, Fixed Address,
-                    # Old Address)
-                    package = self.package_manager.packages.get_package(current_action.value[1])
-                    package.address = current_action.value[3][0].strip()
-                    package.city = current_action.value[3][1].strip()
-                    package.state = current_action.value[3][2].strip()
-                    package.package_zip = current_action.value[3][3]
+        package = package_manager.writable_package(current_action.value[1])
+        package_manager.update_status(package, f"In transit via Truck {truck.number}.")
 
-                    package.status = "Wrong address provided. Will be updated soon."
+    # Undeliver the package, change the status, undue the mileage added, and reload the package onto the truck.
+    elif current_action.action_type == "DeliveredPackage":  # (Truck Number, Miles, Package ID)
 
-                # Reinsert the action into the front of the scheduled plan queue.
-                self.scheduled_plan_queue.insert(0, current_action)
+        package = package_manager.writable_package(current_action.value[2])
+        package_manager.update_delivery(package, None)
+        package_manager.update_status(package, f"En route to Destination via Truck {truck.number}.")
+        package_manager.update_truck(package, truck.number)
+        truck.add_miles(-current_action.value[1])
 
-                # Grab the next action from the executed stack if there are still actions available.
-                if len(self.executed_stack) == 0:
-                    break
-                else:
-                    current_action = self.executed_stack.pop(0)
+        truck.load_package(package)
 
+    # Undue the mileage added to the truck for the return trip.
+    elif current_action.action_type == "Returning":  # (Truck Number, Miles, Last Location, HUB)
+        truck.add_miles(-current_action.value[1])
 
-class Action:
+    # Change the package back to the wrong address listed and change the status back.
+    elif current_action.action_type == "FixedAddress":  # (Truck Number, Package ID, Fixed Address, Old Address)
+        package = package_manager.writable_package(current_action.value[1])
+        package_manager.update_address(package, current_action.value[3][0].strip(), current_action.value[3][1].strip(),
+                                       current_action.value[3][2].strip(), current_action.value[3][3])
 
-    def __init__(self, action_type, time, value):
-        self.action_type = action_type
-        self.time = time
-        self.value = value
+        package_manager.update_status(package, "Wrong address provided. Will be updated soon.")
@@ -0,0 +1,104 @@
+from Truck import Truck
+
+
+class Stop:
+
+    # A stop is a group of packages that are dropped off at the same location. The constraints of every package in the
+    # stop are merged so the scheduler can plan the stop as if it were a single package.
+    def __init__(self, location_name, address):
+        self.location_name = location_name
+        self.address = address
+        self.packages = []
+        self.package_ids = set(list())
+        self.mass = 0
+        self.constraints = {"Deadline": None}
+
+    # Time: O(1) Space: O(1)
+    # Adds the package to the stop and merges its constraints into the stop constraints. The stop deadline is the
+    # earliest package deadline, the stop is available once the latest delayed package has arrived, and a truck
+    # restriction on any package applies to the whole stop. A package restricted to another truck than the stop cannot
+    # join it, in which case False is returned and the stop is left unchanged.
+    def add_package(self, package):
+        truck_number = package.constraints.get("Truck")
+        if truck_number is not None and self.constraints.get("Truck", truck_number) != truck_number:
+            return False
+
+        self.packages.append(package)
+        self.package_ids.add(package.package_id)
+        self.mass += int(package.mass)
+
+        deadline = package.constraints["Deadline"]
+        if deadline and (self.constraints["Deadline"] is None or deadline < self.constraints["Deadline"]):
+            self.constraints["Deadline"] = deadline
+
+        if "Delayed" in package.constraints.keys():
+            if "Delayed" not in self.constraints.keys() or package.constraints["Delayed"] > self.constraints["Delayed"]:
+                self.constraints["Delayed"] = package.constraints["Delayed"]
+
+        if "Wrong" in package.constraints.keys():
+            self.constraints["Wrong"] = package.constraints["Wrong"]
+
+        if "Truck" in package.constraints.keys():
+            self.constraints["Truck"] = package.constraints["Truck"]
+
+        # Packages bound to each other inside the same stop are always delivered together so only the packages outside
+        # of the stop are kept in the delivered with constraint.
+        if "Delivered_With" in package.constraints.keys() or "Delivered_With" in self.constraints.keys():
+            bound_ids = set(self.constraints.get("Delivered_With", []))
+            bound_ids.update(package.constraints.get("Delivered_With", []))
+            self.constraints["Delivered_With"] = sorted(bound_ids - self.package_ids)
+
+        return True
+
+    # Returns the number of packages in the stop.
+    def size(self):
+        return len(self.packages)
+
+
+# Time: O(1) Space: O(1)
+# Returns the address the package will actually be delivered to. Packages with a wrong address are delivered to the
+# corrected address listed in their constraints.
+def resolved_address(package):
+    if "Wrong" in package.constraints.keys():
+        return package.constraints["Wrong"].split(',')[0].strip().strip('.')
+    return package.address
+
+
+# Time: O(N) Space: O(N)
+# Groups the packages into stops by the location they are delivered to. Packages that become available at different
+# times are kept in separate stops so an early package never has to wait for a delayed one, and packages restricted to
+# different trucks are kept apart so every restriction is kept. A stop never holds more packages or more mass than a
+# truck can carry.
+def build_stops(packages, location_graph, capacity=Truck.capacity, mass_capacity=Truck.mass_capacity):
+    stops = []
+    open_stops = {}
+    for package in packages:
+        address = resolved_address(package)
+        stop_key = (address, package.constraints.get("Delayed"), package.constraints.get("Truck"))
+
+        stop = open_stops.get(stop_key)
+        if stop is None or stop.size() >= capacity or \
+                (mass_capacity is not None and stop.mass + int(package.mass) > mass_capacity):
+            stop = Stop(location_graph.location_name_from_address(address), address)
+            open_stops[stop_key] = stop
+            stops.append(stop)
+
+        stop.add_package(package)
+
+    return stops
+
+
+# Time: O(N) Space: O(N)
+# Merges stops that share a location into a single stop. This is used once a trip has been loaded, at which point
+# every package on the truck is available and only the destination matters for routing. A package the merged stop
+# refuses because of a truck restriction gets a stop of its own at the same location.
+def merge_stops(stops):
+    merged_stops = {}
+    for stop in stops:
+        location_stops = merged_stops.setdefault(stop.location_name, [])
+        for package in stop.packages:
+            if not any(location_stop.add_package(package) for location_stop in location_stops):
+                location_stops.append(Stop(stop.location_name, stop.address))
+                location_stops[-1].add_package(package)
+
+    return [merged_stop for location_stops in merged_stops.values() for merged_stop in location_stops]
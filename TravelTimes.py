@@ -0,0 +1,135 @@
+import csv
+from array import array
+from datetime import timedelta
+
+from Location import floyd_warshall_limit
+from PackageManager import parse_time
+
+# Speed used for every leg at every time when no speed profile is given.
+travel_speed_mph = 18
+# Length of a time bucket of the travel time table.
+default_bucket_minutes = 30
+# Hours after the start time the table covers. Legs starting later use the last bucket.
+default_day_hours = 16
+
+
+class TravelTimeTable:
+
+    # The travel time table holds the hours needed to drive between every pair of locations for every time bucket of the
+    # day, so travel times can follow rush hours without any work in the planning loops. The table is stored as a
+    # single flat array of doubles indexed by bucket, origin and destination. Times are hours after the start time.
+    # speed_changes is a list of (time, mph) pairs setting the speed of every leg from that time on, and zone_changes
+    # maps a location name to its own (time, mph) pairs. A leg starting or ending at a location with a zone speed
+    # drives at the slowest of those speeds. Large road networks that are not closed over shortest paths compute their
+    # travel times on demand from the bucket speeds instead.
+    def __init__(self, location_graph, start_time, speed_changes=None, zone_changes=None,
+                 bucket_minutes=default_bucket_minutes, day_hours=default_day_hours):
+        self.location_graph = location_graph
+        self.start_time = start_time
+        self.bucket_minutes = bucket_minutes
+        self.bucket_count = max(1, int(day_hours * 60 // bucket_minutes))
+        self.location_count = len(location_graph.locations)
+
+        bucket_times = [start_time + timedelta(minutes=bucket * bucket_minutes) for bucket in range(self.bucket_count)]
+        speed_changes = sorted(speed_changes or [])
+        self.bucket_speeds = [speed_at(speed_changes, bucket_time, travel_speed_mph) for bucket_time in bucket_times]
+
+        # zone_speeds[bucket][location index] is the zone speed of the location or None without one.
+        self.zone_speeds = [[None] * self.location_count for bucket in range(self.bucket_count)]
+        for location_name, changes in (zone_changes or {}).items():
+            location_index = location_graph.location_index[location_name]
+            changes = sorted(changes)
+            for bucket, bucket_time in enumerate(bucket_times):
+                self.zone_speeds[bucket][location_index] = speed_at(changes, bucket_time, None)
+
+        self.slowest_mph = min(min(self.bucket_speeds), min((speed for bucket_speeds in self.zone_speeds
+                                                             for speed in bucket_speeds if speed is not None),
+                                                            default=travel_speed_mph))
+        # A constant table gives every leg the same driving time whenever it starts, so a delay at one stop pushes
+        # every later stop back by the same amount.
+        self.constant = len(set(self.bucket_speeds)) == 1 and \
+            all(len(set(bucket_speeds[location_index] for bucket_speeds in self.zone_speeds)) == 1
+                for location_index in range(self.location_count))
+
+        self.table = None
+        if self.location_count <= floyd_warshall_limit:
+            self.build_table()
+
+    # Time: O(B * N^2) Space: O(B * N^2)
+    def build_table(self):
+        location_count = self.location_count
+        locations = self.location_graph.locations
+        miles = [[self.location_graph.miles_between(start.name, destination.name) for destination in locations]
+                 for start in locations]
+
+        self.table = array('d', [float('inf')]) * (self.bucket_count * location_count * location_count)
+        for bucket in range(self.bucket_count):
+            bucket_offset = bucket * location_count * location_count
+            for i in range(location_count):
+                row_offset = bucket_offset + i * location_count
+                for j in range(location_count):
+                    if miles[i][j] is not None:
+                        self.table[row_offset + j] = miles[i][j] / self.leg_speed(bucket, i, j)
+
+    # Time: O(1) Space: O(1)
+    # Returns the speed of the leg between the two location indexes for the bucket.
+    def leg_speed(self, bucket, start_index, destination_index):
+        zone_speeds = [zone_speed for zone_speed in (self.zone_speeds[bucket][start_index],
+                                                     self.zone_speeds[bucket][destination_index])
+                       if zone_speed is not None]
+        return min(zone_speeds) if zone_speeds else self.bucket_speeds[bucket]
+
+    # Time: O(1) Space: O(1)
+    def bucket_of(self, departure_hours):
+        bucket = int(departure_hours * 60 // self.bucket_minutes)
+        return min(max(bucket, 0), self.bucket_count - 1)
+
+    # Time: O(1) Space: O(1)
+    # Returns the hours needed to drive from the start to the destination when leaving departure_hours after the start
+    # time of the table.
+    def hours(self, start, destination, departure_hours):
+        bucket = self.bucket_of(departure_hours)
+        start_index = self.location_graph.location_index[start]
+        destination_index = self.location_graph.location_index[destination]
+        if self.table is not None:
+            return self.table[(bucket * self.location_count + start_index) * self.location_count + destination_index]
+
+        miles = self.location_graph.miles_between(start, destination)
+        if miles is None:
+            return float('inf')
+        return miles / self.leg_speed(bucket, start_index, destination_index)
+
+    # Time: O(1) Space: O(1)
+    # Returns the time of arrival at the destination when leaving the start at the departure time.
+    def arrival_time(self, start, destination, departure_time):
+        departure_hours = (departure_time - self.start_time).total_seconds() / 3600
+        return departure_time + timedelta(hours=self.hours(start, destination, departure_hours))
+
+
+# Time: O(C) Space: O(1)
+# Returns the speed of the last change at or before the time, or the default before the first change.
+def speed_at(changes, time, default):
+    speed = default
+    for change_time, mph in changes:
+        if change_time > time:
+            break
+        speed = mph
+    return speed
+
+
+# Time: O(R) Space: O(R)
+# Reads a speed profile file. Speed rows (start time, mph) set the speed of every leg from that time on and Zone rows
+# (location name, start time, mph) set the speed of legs starting or ending at the location. Returns the speed changes
+# and zone changes the travel time table takes.
+def load_speed_profile(file_name):
+    speed_changes = []
+    zone_changes = {}
+    with open(file_name, 'r', encoding='UTF-8', newline='') as profile_file:
+        for row in csv.reader(profile_file):
+            if not row:
+                continue
+            if row[0] == "Speed":
+                speed_changes.append((parse_time(row[1]), float(row[2])))
+            elif row[0] == "Zone":
+                zone_changes.setdefault(row[1].strip(), []).append((parse_time(row[2]), float(row[3])))
+    return speed_changes, zone_changes
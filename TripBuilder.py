@@ -0,0 +1,331 @@
+# Number of cheapest insertion positions compared by the regret rule.
+default_regret_k = 3
+# Regret given to every missing position when a unit has fewer than k feasible positions. Units with few options are
+# inserted first before the other units take their place.
+missing_position_regret = 1000
+epsilon = 1e-9
+
+
+class TripRoute:
+
+    # A trip route is the ordered list of stops a truck visits between leaving and returning to the HUB. Along with the
+    # stops it keeps the arrival time at every position and the forward time slack, which is how many hours the
+    # arrival at that position and every position after it can be pushed back before a deadline is missed. Times are
+    # hours after the start time of the travel time table, which gives the driving time of every leg.
+    def __init__(self, location_graph, travel_times, start_hours, hub):
+        self.location_graph = location_graph
+        self.travel_times = travel_times
+        self.start_hours = start_hours
+        self.hub = hub
+        self.stops = []
+        self.latest = []
+        self.arrival = []
+        self.slack = [float("inf")]
+        self.miles = 0.0
+        self.load = 0
+        self.mass = 0
+
+    def location_at(self, position):
+        if position < 0 or position >= len(self.stops):
+            return self.hub
+        return self.stops[position].location_name
+
+    def departure_at(self, position):
+        if position == 0:
+            return self.start_hours
+        return self.arrival[position - 1]
+
+    # Time: O(N) Space: O(1)
+    # Recomputes the arrival times forward from the HUB and the slack backward from the last stop.
+    def update_times(self):
+        arrival_hours = self.start_hours
+        self.arrival = []
+        self.miles = 0.0
+        for position in range(len(self.stops)):
+            previous_location = self.location_at(position - 1)
+            location = self.location_at(position)
+            arrival_hours += self.travel_times.hours(previous_location, location, arrival_hours)
+            self.miles += self.location_graph.miles_between(previous_location, location)
+            self.arrival.append(arrival_hours)
+        self.miles += self.location_graph.miles_between(self.location_at(len(self.stops) - 1), self.hub)
+
+        slack_hours = float("inf")
+        self.slack = [slack_hours]
+        for position in reversed(range(len(self.stops))):
+            slack_hours = min(slack_hours, self.latest[position] - self.arrival[position])
+            self.slack.insert(0, slack_hours)
+
+    # Time: O(N) Space: O(1)
+    # Returns whether every stop is reached before its deadline.
+    def on_time(self):
+        return all(arrival_hours <= latest_hours + epsilon
+                   for arrival_hours, latest_hours in zip(self.arrival, self.latest))
+
+    # Time: O(N) Space: O(1)
+    # Returns whether every stop is still reached before its deadline when the stop is inserted at the position and the
+    # departure is pushed back by hold_hours. The arrivals are driven forward from the first stop that changes.
+    def on_time_with(self, stop, latest_hours, position, hold_hours):
+        first_position = 0 if hold_hours > 0 else position
+        arrival_hours = self.departure_at(first_position) + hold_hours
+        location = self.location_at(first_position - 1)
+        for index in range(first_position, len(self.stops) + 1):
+            if index < position:
+                next_stop, next_latest = self.stops[index], self.latest[index]
+            elif index == position:
+                next_stop, next_latest = stop, latest_hours
+            else:
+                next_stop, next_latest = self.stops[index - 1], self.latest[index - 1]
+            arrival_hours += self.travel_times.hours(location, next_stop.location_name, arrival_hours)
+            if arrival_hours > next_latest + epsilon:
+                return False
+            location = next_stop.location_name
+        return True
+
+    # Time: O(N) Space: O(N)
+    # Returns every position the stop can be inserted at as (added miles, position) pairs. The trip departure is
+    # pushed back by hold_hours first. With a constant travel time table each position is checked in O(1): the stop
+    # must be reached before its own deadline and the extra driving time must fit in the slack of the stops after it.
+    # When the driving times depend on the time of day a delay can grow or shrink further along the trip, so every
+    # position is checked by driving the rest of the trip forward in O(N) instead.
+    def insertion_options(self, stop, latest_hours, hold_hours=0.0):
+        options = []
+        if self.travel_times.constant and hold_hours > self.slack[0] + epsilon:
+            return options
+
+        for position in range(len(self.stops) + 1):
+            previous_location = self.location_at(position - 1)
+            next_location = self.location_at(position)
+            to_stop = self.location_graph.miles_between(previous_location, stop.location_name)
+            from_stop = self.location_graph.miles_between(stop.location_name, next_location)
+            skipped = self.location_graph.miles_between(previous_location, next_location)
+
+            departure_hours = self.departure_at(position) + hold_hours
+            stop_arrival_hours = departure_hours + self.travel_times.hours(previous_location, stop.location_name,
+                                                                           departure_hours)
+            if stop_arrival_hours > latest_hours + epsilon:
+                continue
+
+            if self.travel_times.constant:
+                # The stops after the new one are reached later by the hold and the extra driving time.
+                old_next_arrival = self.departure_at(position) + self.travel_times.hours(
+                    previous_location, next_location, self.departure_at(position))
+                new_next_arrival = stop_arrival_hours + self.travel_times.hours(stop.location_name, next_location,
+                                                                                stop_arrival_hours)
+                if new_next_arrival - old_next_arrival > self.slack[position] + epsilon:
+                    continue
+            elif not self.on_time_with(stop, latest_hours, position, hold_hours):
+                continue
+
+            added_miles = to_stop + from_stop - skipped
+            options.append((added_miles, position))
+
+        return options
+
+    # Time: O(N) Space: O(1)
+    def insert(self, stop, latest_hours, position, hold_hours=0.0):
+        self.start_hours += hold_hours
+        self.stops.insert(position, stop)
+        self.latest.insert(position, latest_hours)
+        self.load += stop.size()
+        self.mass += stop.mass
+        self.update_times()
+
+    def copy(self):
+        route_copy = TripRoute(self.location_graph, self.travel_times, self.start_hours, self.hub)
+        route_copy.stops = self.stops.copy()
+        route_copy.latest = self.latest.copy()
+        route_copy.arrival = self.arrival.copy()
+        route_copy.slack = self.slack.copy()
+        route_copy.miles = self.miles
+        route_copy.load = self.load
+        route_copy.mass = self.mass
+        return route_copy
+
+
+class InsertionUnit:
+
+    # An insertion unit is the set of stops that must be placed on the same trip. Most units hold a single stop while
+    # stops tied together by a Delivered_With constraint form one unit.
+    def __init__(self, stops, tier):
+        self.stops = stops
+        self.tier = tier
+        self.size = sum(stop.size() for stop in stops)
+        self.mass = sum(stop.mass for stop in stops)
+        self.truck = None
+        self.release = None
+        for stop in stops:
+            if "Truck" in stop.constraints.keys():
+                self.truck = stop.constraints["Truck"]
+            if "Delayed" in stop.constraints.keys():
+                if self.release is None or stop.constraints["Delayed"] > self.release:
+                    self.release = stop.constraints["Delayed"]
+
+
+class RegretInsertionBuilder:
+
+    def __init__(self, location_graph, travel_times, regret_k=default_regret_k):
+        self.location_graph = location_graph
+        self.travel_times = travel_times
+        self.regret_k = regret_k
+
+    # Time: O(N) Space: O(N)
+    # Groups the remaining stops into insertion units. Stops whose packages are bound together by a Delivered_With
+    # constraint are joined into one unit, which is placed in the highest priority tier of its stops.
+    def build_units(self, stop_tiers):
+        unit_of_package = {}
+        units = []
+        for tier_index, stop_list in enumerate(stop_tiers):
+            for stop in stop_list:
+                unit = InsertionUnit([stop], tier_index)
+                units.append(unit)
+                for package_id in stop.package_ids:
+                    unit_of_package[package_id] = unit
+
+        merged_units = []
+        for unit in units:
+            if unit.stops is None:
+                continue
+            bound_stops = unit.stops
+            tier_index = unit.tier
+            pending = list(unit.stops)
+            while pending:
+                stop = pending.pop()
+                for package_id in stop.constraints.get("Delivered_With", []):
+                    bound_unit = unit_of_package.get(package_id)
+                    if bound_unit is None or bound_unit is unit or bound_unit.stops is None:
+                        continue
+                    for bound_stop in bound_unit.stops:
+                        if bound_stop not in bound_stops:
+                            bound_stops.append(bound_stop)
+                            pending.append(bound_stop)
+                    tier_index = min(tier_index, bound_unit.tier)
+                    bound_unit.stops = None
+            merged_units.append(InsertionUnit(bound_stops, tier_index))
+
+        return merged_units
+
+    # Time: O(1) Space: O(1)
+    # Returns the hours the truck has to wait at the HUB for the unit to arrive. Waiting costs no miles, so the unit
+    # can hold the truck as long as the slack of the trip allows it.
+    def hold_hours(self, route, unit, start_time):
+        if unit.release is None:
+            return 0.0
+        release_hours = (unit.release - start_time).total_seconds() / 3600
+        return max(0.0, release_hours - route.start_hours)
+
+    def latest_hours(self, stop, start_time):
+        if stop.constraints["Deadline"] is None:
+            return float("inf")
+        return (stop.constraints["Deadline"] - start_time).total_seconds() / 3600
+
+    # Time: O(N) Space: O(N)
+    # Returns the insertion costs of the unit sorted from cheapest to most expensive along with the route each one would
+    # produce. Single stop units are checked against every position in O(1) each. Larger units insert their stops one
+    # at a time at the cheapest position and only have a single option.
+    def unit_options(self, route, unit, truck, start_time):
+        if unit.truck is not None and unit.truck != truck.number:
+            return []
+        if not truck.fits(route.load + unit.size, route.mass + unit.mass):
+            return []
+        hold_hours = self.hold_hours(route, unit, start_time)
+
+        if len(unit.stops) == 1:
+            stop = unit.stops[0]
+            latest_hours = self.latest_hours(stop, start_time)
+            options = route.insertion_options(stop, latest_hours, hold_hours)
+            return sorted([(added_miles, (position, hold_hours)) for added_miles, position in options],
+                          key=lambda option: option[0])
+
+        trial_route = route.copy()
+        total_added_miles = 0.0
+        ordered_stops = sorted(unit.stops, key=lambda unit_stop: self.latest_hours(unit_stop, start_time))
+        for index, stop in enumerate(ordered_stops):
+            latest_hours = self.latest_hours(stop, start_time)
+            stop_hold_hours = hold_hours if index == 0 else 0.0
+            options = trial_route.insertion_options(stop, latest_hours, stop_hold_hours)
+            if not options:
+                return []
+            added_miles, position = min(options)
+            trial_route.insert(stop, latest_hours, position, stop_hold_hours)
+            total_added_miles += added_miles
+
+        return [(total_added_miles, trial_route)]
+
+    # Time: O(N^2 * M) Space: O(N)
+    # Builds the trip for the truck from the stop tiers. Tiers are filled in priority order. Within a tier the regret-k
+    # rule inserts the unit that would lose the most by waiting, which is the sum of the differences between its k
+    # cheapest positions and its cheapest one. Inserted stops are removed from the tiers. The truck is held at the HUB
+    # if a delayed unit with a deadline was inserted and the route is returned in visiting order.
+    def build(self, truck, stop_tiers):
+        start_time = self.travel_times.start_time
+        route = TripRoute(self.location_graph, self.travel_times,
+                          (truck.loading_time - start_time).total_seconds() / 3600, truck.hub)
+        units = self.build_units(stop_tiers)
+        held_until = None
+
+        for tier_index in range(len(stop_tiers)):
+            tier_units = [unit for unit in units if unit.tier == tier_index]
+            while tier_units and route.load < truck.capacity:
+                best_unit = None
+                best_option = None
+                best_regret = None
+                best_holds = None
+                for unit in tier_units:
+                    options = self.unit_options(route, unit, truck, start_time)
+                    if not options:
+                        continue
+                    regret = 0.0
+                    for k in range(1, self.regret_k):
+                        if k < len(options):
+                            regret += options[k][0] - options[0][0]
+                        else:
+                            regret += missing_position_regret
+                    # A unit without a deadline that would hold the truck at the HUB is only inserted once no other
+                    # unit of the tier fits, so it never holds the truck past the deadlines of the other units.
+                    holds = self.hold_hours(route, unit, start_time) > 0 and \
+                        all(stop.constraints["Deadline"] is None for stop in unit.stops)
+                    if best_regret is None or (not holds and best_holds) or (holds == best_holds and (
+                            regret > best_regret + epsilon or
+                            (abs(regret - best_regret) <= epsilon and options[0][0] < best_option[0]))):
+                        best_unit = unit
+                        best_option = options[0]
+                        best_regret = regret
+                        best_holds = holds
+
+                if best_unit is None:
+                    break
+
+                previous_start_hours = route.start_hours
+                if len(best_unit.stops) == 1:
+                    stop = best_unit.stops[0]
+                    position, hold_hours = best_option[1]
+                    candidate_route = route.copy()
+                    candidate_route.insert(stop, self.latest_hours(stop, start_time), position, hold_hours)
+                else:
+                    candidate_route = best_option[1]
+
+                # The finished route is checked once more so a late trip is never returned. A unit that would make the
+                # trip late is left for another trip.
+                if not candidate_route.on_time():
+                    tier_units.remove(best_unit)
+                    continue
+                route = candidate_route
+
+                if route.start_hours > previous_start_hours:
+                    held_until = best_unit.release
+
+                tier_units.remove(best_unit)
+                units.remove(best_unit)
+                for stop in best_unit.stops:
+                    for stop_list in stop_tiers:
+                        if stop in stop_list:
+                            stop_list.remove(stop)
+
+        if held_until is not None:
+            truck.hold_until(held_until)
+
+        for stop in route.stops:
+            for package in stop.packages:
+                truck.load_package(package)
+
+        return route.stops
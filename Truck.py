@@ -1,21 +1,28 @@
+import copy
 from datetime import datetime
 
+from Location import default_hub_location
 from PackageManager import Package
 
 
 class Truck:
 
+    # Largest number of packages the truck can carry.
     capacity = 16
+    # Largest total package mass in kilos the truck can carry. None means only the package count limits the load.
+    mass_capacity = None
 
-    # Initialize a Truck object with some initial values. Currently the truck numbering can only be 1, 2, or 3.
-    def __init__(self, number):
+    # Initialize a Truck object with some initial values. The truck starts and ends every trip at its hub.
+    def __init__(self, number, hub=default_hub_location):
         self.trips = 0
         self.holding_until = None
         self.on_hold = False
-        if number in range(1, 4):
-            self.number = number
-        self.packages = []
-        self.last_location = "Western Governors University"
+        self.number = number
+        self.hub = hub
+        # The manifest maps each package ID on board to its package in the order the packages were loaded.
+        self.packages = {}
+        self.load_mass = 0
+        self.last_location = hub
         self.time = datetime.strptime("8:00 AM", "%I:%M %p")
         self.loading_time = self.time
         self.returning = False
@@ -29,19 +36,41 @@ class Truck:
 
     # Check that the truck has space for additional packages.
     def has_space(self):
-        if len(self.packages) != self.capacity:
+        if len(self.packages) < self.capacity:
             return True
         else:
             return False
 
+    # Time: O(1) Space: O(1)
+    # Checks that a load of this many packages weighing this many kilos stays within the truck capacity.
+    def fits(self, package_count, mass):
+        if package_count > self.capacity:
+            return False
+        return self.mass_capacity is None or mass <= self.mass_capacity
+
+    # Time: O(1) Space: O(1)
+    # Check that the package can be added to the current load.
+    def has_space_for(self, package: Package):
+        return self.fits(len(self.packages) + 1, self.load_mass + int(package.mass))
+
     # Return the number of packages currently on board the truck.
     def current_load(self):
         return len(self.packages)
 
-    # Load the package onto the truck given there is available space.
-    def load_package(self, package):
-        if self.has_space():
-            self.packages.append(package)
+    # Return the mass in kilos currently on board the truck.
+    def current_mass(self):
+        return self.load_mass
+
+    # Time: O(1) Space: O(1)
+    # Load the package onto the truck given there is available space. A package already on board is only replaced by the
+    # package object given, so its mass is never counted twice.
+    def load_package(self, package: Package):
+        if package.package_id in self.packages:
+            self.packages[package.package_id] = package
+            return True
+        if self.has_space_for(package):
+            self.packages[package.package_id] = package
+            self.load_mass += int(package.mass)
             return True
         else:
             return False
@@ -50,25 +79,28 @@ class Truck:
     def unload_package(self, package: Package):
         return self.unload_package_id(package.package_id)
 
+    # Time: O(1) Space: O(1)
     # Unload the package with the given package ID from the truck.
     def unload_package_id(self, package_id):
-        for package in self.packages:
-            if type(package) == Package:
-                if package_id == package.package_id:
-                    self.packages.remove(package)
-                    break
+        package = self.packages.pop(package_id, None)
+        if package is not None:
+            self.load_mass -= int(package.mass)
 
+    # Time: O(1) Space: O(1)
     # Checks if a package with the package ID is on board the truck.
     def package_onboard(self, package_id):
-        for package in self.packages:
-            if type(package) == Package:
-                if package.package_id == package_id:
-                    return True
-        return False
+        return package_id in self.packages
 
     # Empties the truck of all packages
     def unload_all(self):
-        self.packages = []
+        self.packages = {}
+        self.load_mass = 0
+
+    # Returns a copy of the truck with its own manifest.
+    def copy(self):
+        truck_copy = copy.copy(self)
+        truck_copy.packages = self.packages.copy()
+        return truck_copy
 
     # Change the location of the truck.
     def change_location(self, new_location):